@@ -1,104 +1,182 @@
+import hashlib
+import json
 import logging
-from flask import Flask, request, jsonify, send_from_directory
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context, url_for
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import os
 from dotenv import load_dotenv
+from limiter_storage import RATE_LIMIT_ENABLED, RATE_LIMIT_STORAGE_URI, RATE_LIMIT_STRATEGY
+from log_config import begin_request, configure_logging
+from metrics import CONTENT_TYPE, http_request_seconds, rate_limit_rejections, render_metrics
+from static_assets import has_static_asset, load_static_assets, send_static_asset
 try:
-    from recipe_generator import generate_dynamic_recipe, generate_random_recipe
-    from database import get_all_recipes, get_flavor_pairs, update_recipe_rating, get_recipe_comments
+    from recipe_generator import elucidate_recipe as elucidate_recipe_text, generate_dynamic_recipe, generate_random_recipe, generate_recipe_batch, pick_random_ingredients, stream_dynamic_recipe
+    from response_cache import response_cache
+    from single_flight import generate_once, is_successful
+    from random_pool import random_pool
+    from xai_client import upstream_stats
+    from database import init_db, find_recipes_with_ingredients, get_all_recipes, get_flavor_pairs, get_table_version, update_recipe_rating, get_recipe_comments_page
 except ImportError as e:
     logging.error(f"Missing dependency during import: {str(e)}")
     raise
 
-# Configure logging to console for Render
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s - %(pathname)s:%(lineno)d'
-)
+# Non-blocking, sampled logging to console (for Render) and file; see log_config.py
+configure_logging()
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-app = Flask(__name__, static_folder='rg_new_app/dist', static_url_path='/')
+ALLOWED_ORIGINS = ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"]
+
+# Page sizes for /recipe_comments; every response is one page
+COMMENTS_PAGE_SIZE = 50
+COMMENTS_MAX_PAGE_SIZE = 200
+
+# Result sizes for /api/recipes ingredient filtering
+RECIPES_PAGE_SIZE = 50
+RECIPES_MAX_PAGE_SIZE = 200
+
+# Most ingredient sets one /generate_recipes request may carry
+RECIPE_BATCH_MAX_SIZE = int(os.getenv("RECIPE_BATCH_MAX_SIZE", "50"))
+
+# Built frontend; served by static_assets.py rather than Flask's static route
+STATIC_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rg_new_app', 'dist')
+
+app = Flask(__name__, static_folder=None)
 CORS(app, resources={
     r"/generate_recipe": {
-        "origins": ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"],
+        "origins": ALLOWED_ORIGINS,
+        "methods": ["POST", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Origin"]
+    },
+    r"/generate_recipe/stream": {
+        "origins": ALLOWED_ORIGINS,
+        "methods": ["POST", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Origin"]
+    },
+    r"/generate_recipes": {
+        "origins": ALLOWED_ORIGINS,
         "methods": ["POST", "OPTIONS"],
         "allow_headers": ["Content-Type", "Origin"]
     },
     r"/elucidate_recipe": {
-        "origins": ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"],
+        "origins": ALLOWED_ORIGINS,
         "methods": ["POST", "OPTIONS"],
         "allow_headers": ["Content-Type", "Origin"]
     },
     r"/ingredients": {
-        "origins": ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"],
+        "origins": ALLOWED_ORIGINS,
         "methods": ["GET", "OPTIONS"],
         "allow_headers": ["Content-Type", "Origin"]
     },
     r"/api": {
-        "origins": ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"],
+        "origins": ALLOWED_ORIGINS,
         "methods": ["GET"],
         "allow_headers": ["Content-Type", "Origin"]
     },
     r"/rate_recipe": {
-        "origins": ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"],
+        "origins": ALLOWED_ORIGINS,
         "methods": ["POST", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Origin"]
+        "allow_headers": ["Content-Type", "Origin", "Idempotency-Key"]
     },
     r"/recipe_comments": {
-        "origins": ["http://localhost:5000", "https://chuckle-chow-backend.onrender.com", "https://chuckle-chow-frontend.onrender.com"],
+        "origins": ALLOWED_ORIGINS,
         "methods": ["GET", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Origin"]
+        "allow_headers": ["Content-Type", "Origin"],
+        "expose_headers": ["X-Next-Cursor", "Link"]
     }
 }, supports_credentials=True)
 logger.info("CORS initialized successfully")
 
-# Configure rate limiting
+# Registered before the limiter's own hook so rejected requests are timed too
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    route, method, status = request.endpoint or 'unmatched', request.method, response.status_code
+    if status == 429:
+        rate_limit_rejections.inc(route=route)
+    # Observed when the body is done, so streamed responses count their full duration
+    response.call_on_close(lambda: http_request_seconds.observe(time.perf_counter() - started, route=route, method=method, status=status))
+    return response
+
+# Configure rate limiting; counters are shared by all workers (see limiter_storage.py)
 try:
     limiter = Limiter(
         get_remote_address,
         app=app,
         default_limits=["200 per day", "50 per hour"],
-        storage_uri="memory://"
+        storage_uri=RATE_LIMIT_STORAGE_URI,
+        strategy=RATE_LIMIT_STRATEGY,
+        enabled=RATE_LIMIT_ENABLED
     )
     logger.info("Rate limiter initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize rate limiter: {str(e)}")
     raise
 
+# Create tables, version triggers and seed data if missing
+try:
+    init_db()
+except Exception as e:
+    logger.error(f"Failed to initialize database: {str(e)}")
+    raise
+
+# Index and precompress the frontend build once per process
+try:
+    load_static_assets(STATIC_ROOT)
+except Exception as e:
+    logger.error(f"Failed to index static files: {str(e)}")
+    raise
+
+@app.before_request
+def tag_request_logs():
+    # Tag this request's log records with its endpoint and apply LOG_SAMPLE_RATES
+    begin_request(request.endpoint)
+
 # Serve static files
 @app.route('/assets/<path:path>')
 def serve_static(path):
     logger.debug(f"Serving static file: assets/{path}")
-    try:
-        return send_from_directory(app.static_folder + '/assets', path)
-    except Exception as e:
-        logger.error(f"Error serving static file assets/{path}: {str(e)}")
+    response = send_static_asset(f"assets/{path}")
+    if response is None:
+        logger.error(f"Static file not found: assets/{path}")
         return jsonify({"error": "File not found"}), 404
+    return response
 
 # Serve favicon.ico
 @app.route('/favicon.ico')
 def serve_favicon():
     logger.debug("Serving favicon.ico")
-    try:
-        return send_from_directory(app.static_folder, 'favicon.ico')
-    except Exception as e:
-        logger.error(f"Error serving favicon.ico: {str(e)}")
+    response = send_static_asset('favicon.ico')
+    if response is None:
+        logger.error("favicon.ico not found")
         return jsonify({"error": "Favicon not found"}), 404
+    return response
 
-# Serve index.html for all non-API routes
+# Serve top-level build files, and index.html for all other non-API routes
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve_frontend(path):
     logger.debug(f"Serving frontend for path: {path}")
     try:
-        if path.startswith(('generate_recipe', 'ingredients', 'elucidate_recipe', 'rate_recipe', 'recipe_comments', 'api', 'assets', 'favicon.ico')):
+        if path.startswith(('generate_recipe', 'ingredients', 'elucidate_recipe', 'rate_recipe', 'recipe_comments', 'api', 'metrics', 'assets', 'favicon.ico')):
             logger.debug(f"Path {path} is an API or static route, passing to Flask")
             return app.handle_http_exception(404)
-        return send_from_directory(app.static_folder, 'index.html')
+        response = send_static_asset(path if path and has_static_asset(path) else 'index.html')
+        if response is None:
+            logger.error("index.html not found in the frontend build")
+            return jsonify({"error": "Failed to serve frontend"}), 500
+        return response
     except Exception as e:
         logger.error(f"Error serving frontend for path {path}: {str(e)}")
         return jsonify({"error": "Failed to serve frontend"}), 500
@@ -108,14 +186,82 @@ def api():
     logger.debug("Serving /api endpoint")
     return jsonify({"message": "Welcome to the Chuckle & Chow API"})
 
+@app.route('/api/stats', methods=['GET'])
+def api_stats():
+    logger.debug("Serving /api/stats endpoint")
+    response = jsonify({"llm_cache": response_cache.stats(), "random_pool": random_pool.stats(), "upstream": upstream_stats()})
+    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    return response
+
+@app.route('/api/recipes', methods=['GET'])
+@limiter.limit("100 per minute")
+def api_recipes():
+    logger.debug("Serving /api/recipes endpoint")
+    try:
+        ingredient_names = [name.strip() for name in request.args.getlist('ingredient') if name.strip()]
+        if not ingredient_names:
+            logger.error("Missing ingredient in api/recipes request")
+            return jsonify({"text": "Server error: At least one ingredient query parameter is required"}), 400
+
+        raw_limit = request.args.get('limit')
+        try:
+            limit = RECIPES_PAGE_SIZE if raw_limit is None else int(raw_limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            logger.error(f"Invalid limit in api/recipes request: {raw_limit}")
+            return jsonify({"text": "Server error: limit must be a positive integer"}), 400
+
+        # Indexed lookup on the normalized ingredient tables
+        recipes = find_recipes_with_ingredients(ingredient_names, min(limit, RECIPES_MAX_PAGE_SIZE))
+        logger.debug(f"Found {len(recipes)} recipes with ingredients {ingredient_names}")
+        return jsonify(recipes)
+    except Exception as e:
+        logger.error(f"Error in api/recipes: {str(e)}", exc_info=True)
+        return jsonify({"text": f"Server error: {str(e)}"}), 500
+
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def metrics():
+    # Prometheus scrape target; sums every worker's metrics (see metrics.py)
+    response = Response(render_metrics(), content_type=CONTENT_TYPE)
+    response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    return response
+
+# Serialized /ingredients body and its ETag, rebuilt when flavor_pairs changes
+INGREDIENTS_CACHE_CONTROL = 'public, max-age=300, must-revalidate'
+_ingredients_lock = threading.Lock()
+_ingredients_payload = (None, None, None)
+
+def get_ingredients_payload():
+    """Return (body, etag) for /ingredients, re-serializing only when the flavor_pairs version changes."""
+    global _ingredients_payload
+    version = get_table_version('flavor_pairs')
+    cached_version, body, etag = _ingredients_payload
+    if version is not None and version == cached_version:
+        return body, etag
+
+    with _ingredients_lock:
+        cached_version, body, etag = _ingredients_payload
+        if version is None or version != cached_version:
+            body = json.dumps(get_flavor_pairs(), sort_keys=True, separators=(',', ':')).encode('utf-8')
+            etag = hashlib.sha256(body).hexdigest()[:32]
+            if version is not None:
+                _ingredients_payload = (version, body, etag)
+            logger.debug(f"Rebuilt /ingredients payload at flavor_pairs version {version}: {len(body)} bytes")
+        return body, etag
+
 @app.route('/ingredients', methods=['GET'])
 @limiter.limit("100 per minute")
 def ingredients():
     logger.debug("Serving /ingredients endpoint")
     try:
-        flavor_pairs = get_flavor_pairs()
-        logger.debug(f"Returning flavor pairs: {flavor_pairs}")
-        return jsonify(flavor_pairs)
+        body, etag = get_ingredients_payload()
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = INGREDIENTS_CACHE_CONTROL
+        # Answers If-None-Match with a bodiless 304
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Error in ingredients endpoint: {str(e)}", exc_info=True)
         return jsonify({"error": f"Failed to fetch ingredients: {str(e)}"}), 500
@@ -125,13 +271,10 @@ def ingredients():
 def generate_recipe():
     logger.debug("Serving /generate_recipe endpoint")
     try:
-        raw_data = request.get_data(as_text=True)
-        logger.debug(f"Raw request data: {raw_data}")
-
         try:
             data = request.get_json(force=True)
         except Exception as e:
-            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {raw_data}")
+            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {request.get_data(as_text=True)}")
             return jsonify({"text": f"Server error: Invalid JSON format - {str(e)}"}), 400
 
         if not data:
@@ -141,6 +284,7 @@ def generate_recipe():
         ingredients = data.get('ingredients', [])
         is_random = data.get('isRandom', False)
         request_id = data.get('requestId', '')
+        preferences = {'language': data.get('language', 'english')}
 
         logger.debug(f"Received generate_recipe request: ingredients={ingredients}, isRandom={is_random}, requestId={request_id}")
 
@@ -148,7 +292,13 @@ def generate_recipe():
             logger.error(f"Invalid ingredients format: {ingredients}")
             return jsonify({"text": "Server error: Ingredients must be a list of strings"}), 400
 
-        recipe = generate_random_recipe() if is_random else generate_dynamic_recipe(ingredients)
+        # Share one upstream call between duplicate and concurrent identical requests
+        recipe = generate_once(
+            request_id, ingredients, is_random,
+            lambda: (random_pool.pop(preferences['language']) or generate_random_recipe(preferences['language'])) if is_random
+            else generate_dynamic_recipe(ingredients, preferences),
+            preferences
+        )
         
         if not recipe or 'text' not in recipe:
             logger.error(f"Failed to generate recipe: {recipe}")
@@ -162,18 +312,114 @@ def generate_recipe():
         logger.error(f"Error in generate_recipe: {str(e)}", exc_info=True)
         return jsonify({"text": f"Server error: {str(e)}"}), 500
 
+@app.route('/generate_recipe/stream', methods=['POST'])
+@limiter.limit("100 per minute")
+def generate_recipe_stream():
+    logger.debug("Serving /generate_recipe/stream endpoint")
+    try:
+        try:
+            data = request.get_json(force=True)
+        except Exception as e:
+            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {request.get_data(as_text=True)}")
+            return jsonify({"text": f"Server error: Invalid JSON format - {str(e)}"}), 400
+
+        if not data:
+            logger.error("No JSON data provided")
+            return jsonify({"text": "Server error: No JSON data provided in request body"}), 400
+
+        ingredients = data.get('ingredients', [])
+        is_random = data.get('isRandom', False)
+        request_id = data.get('requestId', '')
+
+        logger.debug(f"Received generate_recipe/stream request: ingredients={ingredients}, isRandom={is_random}, requestId={request_id}")
+
+        if not isinstance(ingredients, list):
+            logger.error(f"Invalid ingredients format: {ingredients}")
+            return jsonify({"text": "Server error: Ingredients must be a list of strings"}), 400
+
+        if is_random:
+            ingredients, preferences = pick_random_ingredients(), {'language': 'english', 'force_random': True}
+        else:
+            preferences = None
+
+        # Relay the completion to the browser as Server-Sent Events while it streams in
+        def events():
+            for event, text in stream_dynamic_recipe(ingredients, preferences):
+                yield f"event: {event}\ndata: {json.dumps({'text': text})}\n\n"
+
+        response = Response(stream_with_context(events()), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        logger.error(f"Error in generate_recipe_stream: {str(e)}", exc_info=True)
+        return jsonify({"text": f"Server error: {str(e)}"}), 500
+
+def parse_batch_request(data):
+    """Validate a /generate_recipes body; returns (ingredient_sets, preferences) or raises ValueError."""
+    if not isinstance(data, dict):
+        raise ValueError("No JSON data provided in request body")
+    ingredient_sets = data.get('ingredientSets')
+    if not isinstance(ingredient_sets, list) or not ingredient_sets:
+        raise ValueError("ingredientSets must be a non-empty list of ingredient lists")
+    if len(ingredient_sets) > RECIPE_BATCH_MAX_SIZE:
+        raise ValueError(f"At most {RECIPE_BATCH_MAX_SIZE} ingredient sets per request")
+    if not all(isinstance(ingredients, list) for ingredients in ingredient_sets):
+        raise ValueError("Ingredients must be a list of strings")
+    return ingredient_sets, {'language': data.get('language', 'english')}
+
+def batch_cost():
+    """Charge a batch against the generation limit once per ingredient set."""
+    # Parse the body the same way the view does, whatever its Content-Type
+    data = request.get_json(force=True, silent=True)
+    ingredient_sets = data.get('ingredientSets') if isinstance(data, dict) else None
+    return min(max(1, len(ingredient_sets)), RECIPE_BATCH_MAX_SIZE) if isinstance(ingredient_sets, list) else 1
+
+def batch_line(index, recipe):
+    """Encode one batch result as an NDJSON line."""
+    return json.dumps({"index": index, "ok": is_successful(recipe), "text": recipe.get('text', '')}) + "\n"
+
+@app.route('/generate_recipes', methods=['POST'])
+@limiter.limit("100 per minute", cost=batch_cost)
+def generate_recipes():
+    logger.debug("Serving /generate_recipes endpoint")
+    try:
+        try:
+            data = request.get_json(force=True)
+        except Exception as e:
+            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {request.get_data(as_text=True)}")
+            return jsonify({"text": f"Server error: Invalid JSON format - {str(e)}"}), 400
+
+        try:
+            ingredient_sets, preferences = parse_batch_request(data)
+        except ValueError as e:
+            logger.error(f"Invalid generate_recipes request: {str(e)}")
+            return jsonify({"text": f"Server error: {str(e)}"}), 400
+
+        logger.debug(f"Received generate_recipes request for {len(ingredient_sets)} ingredient sets")
+
+        # One NDJSON line per ingredient set, in the order the recipes finish
+        def lines():
+            for index, recipe in generate_recipe_batch(ingredient_sets, preferences):
+                yield batch_line(index, recipe)
+
+        response = Response(stream_with_context(lines()), mimetype='application/x-ndjson')
+        response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+    except Exception as e:
+        logger.error(f"Error in generate_recipes: {str(e)}", exc_info=True)
+        return jsonify({"text": f"Server error: {str(e)}"}), 500
+
 @app.route('/elucidate_recipe', methods=['POST'])
 @limiter.limit("100 per minute")
 def elucidate_recipe():
     logger.debug("Serving /elucidate_recipe endpoint")
     try:
-        raw_data = request.get_data(as_text=True)
-        logger.debug(f"Raw request data: {raw_data}")
-
         try:
             data = request.get_json(force=True)
         except Exception as e:
-            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {raw_data}")
+            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {request.get_data(as_text=True)}")
             return jsonify({"text": f"Server error: Invalid JSON format - {str(e)}"}), 400
 
         if not data or 'recipeText' not in data:
@@ -181,9 +427,13 @@ def elucidate_recipe():
             return jsonify({"text": "Server error: Missing recipeText in request body"}), 400
 
         recipe_text = data['recipeText']
-        logger.debug(f"Elucidating recipe: {recipe_text[:100]}...")
+        logger.debug(f"Elucidating recipe: {str(recipe_text)[:100]}...")
 
-        recipe = generate_dynamic_recipe([], {'recipe_text': recipe_text})
+        try:
+            recipe = elucidate_recipe_text(recipe_text, data.get('language', 'english'))
+        except ValueError as e:
+            logger.error(f"Invalid recipeText in elucidate_recipe request: {str(e)}")
+            return jsonify({"text": f"Server error: {str(e)}"}), 400
         if not recipe or 'text' not in recipe:
             logger.error(f"Failed to elucidate recipe: {recipe}")
             return jsonify({"text": "Server error: Failed to elucidate recipe"}), 500
@@ -201,13 +451,10 @@ def elucidate_recipe():
 def rate_recipe():
     logger.debug("Serving /rate_recipe endpoint")
     try:
-        raw_data = request.get_data(as_text=True)
-        logger.debug(f"Raw request data: {raw_data}")
-
         try:
             data = request.get_json(force=True)
         except Exception as e:
-            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {raw_data}")
+            logger.error(f"Failed to parse JSON: {str(e)}, raw data: {request.get_data(as_text=True)}")
             return jsonify({"text": f"Server error: Invalid JSON format - {str(e)}"}), 400
 
         if not data or 'recipe_id' not in data or 'rating' not in data:
@@ -217,12 +464,14 @@ def rate_recipe():
         recipe_id = data['recipe_id']
         rating = data['rating']
         comment = data.get('comment', '')
+        # Lets client retries of the same rating be applied only once
+        idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotencyKey')
 
         if not isinstance(rating, int) or rating < 1 or rating > 5:
             logger.error(f"Invalid rating value: {rating}")
             return jsonify({"text": "Server error: Rating must be an integer between 1 and 5"}), 400
 
-        update_recipe_rating(recipe_id, rating, comment)
+        update_recipe_rating(recipe_id, rating, comment, idempotency_key)
         logger.info(f"Recipe rated: recipe_id={recipe_id}, rating={rating}")
         response = jsonify({"message": "Rating submitted successfully"})
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
@@ -241,9 +490,28 @@ def recipe_comments():
             logger.error("Missing recipe_id in recipe_comments request")
             return jsonify({"text": "Server error: Missing recipe_id query parameter"}), 400
 
-        comments = get_recipe_comments(recipe_id)
-        logger.debug(f"Returning comments for recipe_id {recipe_id}: {comments}")
+        raw_limit = request.args.get('limit')
+        try:
+            limit = COMMENTS_PAGE_SIZE if raw_limit is None else int(raw_limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            logger.error(f"Invalid limit in recipe_comments request: {raw_limit}")
+            return jsonify({"text": "Server error: limit must be a positive integer"}), 400
+        limit = min(limit, COMMENTS_MAX_PAGE_SIZE)
+
+        try:
+            comments, next_cursor = get_recipe_comments_page(recipe_id, limit, request.args.get('cursor'))
+        except ValueError as e:
+            logger.error(f"Invalid cursor in recipe_comments request: {str(e)}")
+            return jsonify({"text": f"Server error: {str(e)}"}), 400
+
+        logger.debug(f"Returning {len(comments)} comments for recipe_id {recipe_id}")
         response = jsonify(comments)
+        if next_cursor:
+            # The body stays a plain JSON array; the next page is advertised in headers
+            response.headers['X-Next-Cursor'] = next_cursor
+            response.headers['Link'] = f'<{url_for("recipe_comments", recipe_id=recipe_id, limit=limit, cursor=next_cursor)}>; rel="next"'
         response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
         return response
     except Exception as e:
@@ -0,0 +1,326 @@
+"""ASGI entry point with native asyncio handlers for the recipe generation endpoints.
+
+/generate_recipe, /generate_recipe/stream, /generate_recipes and /elucidate_recipe
+are served on the event loop with the async xAI client, so a single worker can keep
+hundreds of slow upstream calls in flight. Every other route is handed to the Flask app, which runs
+in a small thread pool and stays responsive for cheap endpoints like /ingredients.
+
+Run with:
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from a2wsgi import WSGIMiddleware
+from limits import parse
+from log_config import begin_request
+from metrics import http_request_seconds, rate_limit_rejections
+from app import ALLOWED_ORIGINS, app, batch_line, limiter, parse_batch_request
+from recipe_generator import (
+    elucidate_recipe_async, generate_dynamic_recipe_async, generate_random_recipe_async, generate_recipe_batch_async,
+    pick_random_ingredients, stream_dynamic_recipe_async
+)
+from random_pool import random_pool
+from single_flight import generate_once_async
+from xai_client import close_async_http_client, close_http_client
+
+logger = logging.getLogger(__name__)
+
+# Threads available to the wrapped Flask app for the non-generation routes
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "10"))
+
+GENERATION_LIMIT = parse("100 per minute")
+NO_STORE = 'no-store, no-cache, must-revalidate, max-age=0'
+
+flask_application = WSGIMiddleware(app, workers=ASGI_WSGI_THREADS)
+
+def _header(scope, name):
+    """Return a request header value from the ASGI scope, or ''."""
+    name = name.encode('latin-1')
+    for key, value in scope.get('headers', []):
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+def _cors_headers(scope):
+    """Return the CORS response headers for an allowed Origin."""
+    origin = _header(scope, 'origin')
+    if origin not in ALLOWED_ORIGINS:
+        return []
+    return [
+        (b'access-control-allow-origin', origin.encode('latin-1')),
+        (b'access-control-allow-credentials', b'true'),
+        (b'vary', b'Origin')
+    ]
+
+async def _send_response(scope, send, status, body, content_type=b'application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+                   + list(headers) + _cors_headers(scope)
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def _send_json(scope, send, status, data, headers=()):
+    await _send_response(scope, send, status, json.dumps(data).encode('utf-8'), headers=headers)
+
+async def _read_json(receive):
+    """Read the whole request body and decode it as JSON."""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    return json.loads(body or b'null')
+
+def _limit_key(scope, endpoint):
+    """Storage key parts for a limit, built as Flask-Limiter builds them for the same view.
+
+    Flask-Limiter hits [key_prefix,] get_remote_address(), request.endpoint; matching
+    them makes both serving paths draw on one quota per client.
+    """
+    client = scope.get('client') or ('127.0.0.1', 0)
+    # a2wsgi passes the ASGI client address as REMOTE_ADDR
+    args = [client[0], app.view_functions[endpoint].__name__]
+    key_prefix = getattr(limiter, '_key_prefix', '')
+    return [key_prefix, *args] if key_prefix else args
+
+async def _within_rate_limit(scope, endpoint, cost=1):
+    """Count the request against the per-IP generation limit; False if it is exceeded."""
+    if not limiter.enabled:
+        return True
+    # The SQLite storage can wait on a write lock, so keep it off the event loop
+    return await asyncio.to_thread(limiter.limiter.hit, GENERATION_LIMIT, *_limit_key(scope, endpoint), cost=cost)
+
+async def _parse_generation_request(scope, receive, send, endpoint):
+    """Apply the rate limit and parse the JSON body; returns None after sending an error."""
+    if not await _within_rate_limit(scope, endpoint):
+        logger.warning(f"Rate limit exceeded for {endpoint}")
+        await _send_json(scope, send, 429, {"text": f"Server error: Rate limit exceeded ({GENERATION_LIMIT})"})
+        return None
+    try:
+        data = await _read_json(receive)
+    except Exception as e:
+        logger.error(f"Failed to parse JSON: {str(e)}")
+        await _send_json(scope, send, 400, {"text": f"Server error: Invalid JSON format - {str(e)}"})
+        return None
+    if not data:
+        logger.error("No JSON data provided")
+        await _send_json(scope, send, 400, {"text": "Server error: No JSON data provided in request body"})
+        return None
+    return data
+
+async def generate_recipe(scope, receive, send):
+    logger.debug("Serving /generate_recipe endpoint (async)")
+    try:
+        data = await _parse_generation_request(scope, receive, send, 'generate_recipe')
+        if data is None:
+            return
+
+        ingredients = data.get('ingredients', [])
+        is_random = data.get('isRandom', False)
+        request_id = data.get('requestId', '')
+        preferences = {'language': data.get('language', 'english')}
+        logger.debug(f"Received generate_recipe request: ingredients={ingredients}, isRandom={is_random}, requestId={request_id}")
+
+        if not isinstance(ingredients, list):
+            logger.error(f"Invalid ingredients format: {ingredients}")
+            await _send_json(scope, send, 400, {"text": "Server error: Ingredients must be a list of strings"})
+            return
+
+        # Share one upstream call between duplicate and concurrent identical requests
+        async def generate():
+            if is_random:
+                return random_pool.pop(preferences['language']) or await generate_random_recipe_async(preferences['language'])
+            return await generate_dynamic_recipe_async(ingredients, preferences)
+
+        recipe = await generate_once_async(request_id, ingredients, is_random, generate, preferences)
+        if not recipe or 'text' not in recipe:
+            logger.error(f"Failed to generate recipe: {recipe}")
+            await _send_json(scope, send, 500, {"text": f"Server error: Failed to generate recipe - {recipe}"})
+            return
+
+        logger.info(f"Generated recipe: {recipe['text'][:50]}...")
+        await _send_json(scope, send, 200, recipe, headers=[(b'cache-control', NO_STORE.encode())])
+    except Exception as e:
+        logger.error(f"Error in generate_recipe: {str(e)}", exc_info=True)
+        await _send_json(scope, send, 500, {"text": f"Server error: {str(e)}"})
+
+async def generate_recipe_stream(scope, receive, send):
+    logger.debug("Serving /generate_recipe/stream endpoint (async)")
+    try:
+        data = await _parse_generation_request(scope, receive, send, 'generate_recipe_stream')
+        if data is None:
+            return
+
+        ingredients = data.get('ingredients', [])
+        is_random = data.get('isRandom', False)
+        if not isinstance(ingredients, list):
+            logger.error(f"Invalid ingredients format: {ingredients}")
+            await _send_json(scope, send, 400, {"text": "Server error: Ingredients must be a list of strings"})
+            return
+
+        if is_random:
+            ingredients, preferences = pick_random_ingredients(), {'language': 'english', 'force_random': True}
+        else:
+            preferences = None
+    except Exception as e:
+        logger.error(f"Error in generate_recipe_stream: {str(e)}", exc_info=True)
+        await _send_json(scope, send, 500, {"text": f"Server error: {str(e)}"})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', NO_STORE.encode()),
+            (b'x-accel-buffering', b'no')
+        ] + _cors_headers(scope)
+    })
+    async for event, text in stream_dynamic_recipe_async(ingredients, preferences):
+        chunk = f"event: {event}\ndata: {json.dumps({'text': text})}\n\n"
+        await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def generate_recipes(scope, receive, send):
+    logger.debug("Serving /generate_recipes endpoint (async)")
+    try:
+        try:
+            data = await _read_json(receive)
+        except Exception as e:
+            logger.error(f"Failed to parse JSON: {str(e)}")
+            await _send_json(scope, send, 400, {"text": f"Server error: Invalid JSON format - {str(e)}"})
+            return
+        try:
+            ingredient_sets, preferences = parse_batch_request(data)
+        except ValueError as e:
+            logger.error(f"Invalid generate_recipes request: {str(e)}")
+            await _send_json(scope, send, 400, {"text": f"Server error: {str(e)}"})
+            return
+        # A batch costs one generation per ingredient set
+        if not await _within_rate_limit(scope, 'generate_recipes', cost=len(ingredient_sets)):
+            logger.warning("Rate limit exceeded for generate_recipes")
+            await _send_json(scope, send, 429, {"text": f"Server error: Rate limit exceeded ({GENERATION_LIMIT})"})
+            return
+    except Exception as e:
+        logger.error(f"Error in generate_recipes: {str(e)}", exc_info=True)
+        await _send_json(scope, send, 500, {"text": f"Server error: {str(e)}"})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'application/x-ndjson'),
+            (b'cache-control', NO_STORE.encode()),
+            (b'x-accel-buffering', b'no')
+        ] + _cors_headers(scope)
+    })
+    results = generate_recipe_batch_async(ingredient_sets, preferences)
+    try:
+        async for index, recipe in results:
+            await send({'type': 'http.response.body', 'body': batch_line(index, recipe).encode('utf-8'), 'more_body': True})
+    finally:
+        # Cancels outstanding upstream calls if the client disconnected
+        await results.aclose()
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def elucidate_recipe(scope, receive, send):
+    logger.debug("Serving /elucidate_recipe endpoint (async)")
+    try:
+        data = await _parse_generation_request(scope, receive, send, 'elucidate_recipe')
+        if data is None:
+            return
+
+        if 'recipeText' not in data:
+            logger.error("Missing recipeText in elucidate_recipe request")
+            await _send_json(scope, send, 400, {"text": "Server error: Missing recipeText in request body"})
+            return
+
+        recipe_text = data['recipeText']
+        logger.debug(f"Elucidating recipe: {str(recipe_text)[:100]}...")
+
+        try:
+            recipe = await elucidate_recipe_async(recipe_text, data.get('language', 'english'))
+        except ValueError as e:
+            logger.error(f"Invalid recipeText in elucidate_recipe request: {str(e)}")
+            await _send_json(scope, send, 400, {"text": f"Server error: {str(e)}"})
+            return
+        if not recipe or 'text' not in recipe:
+            logger.error(f"Failed to elucidate recipe: {recipe}")
+            await _send_json(scope, send, 500, {"text": "Server error: Failed to elucidate recipe"})
+            return
+
+        logger.info(f"Elucidated recipe: {recipe['text'][:50]}...")
+        await _send_json(scope, send, 200, recipe, headers=[(b'cache-control', NO_STORE.encode())])
+    except Exception as e:
+        logger.error(f"Error in elucidate_recipe: {str(e)}", exc_info=True)
+        await _send_json(scope, send, 500, {"text": f"Server error: {str(e)}"})
+
+ASYNC_ROUTES = {
+    '/generate_recipe': generate_recipe,
+    '/generate_recipe/stream': generate_recipe_stream,
+    '/generate_recipes': generate_recipes,
+    '/elucidate_recipe': elucidate_recipe
+}
+
+async def _preflight(scope, send):
+    """Answer a CORS preflight for one of the async routes."""
+    headers = _cors_headers(scope)
+    if headers:
+        headers += [
+            (b'access-control-allow-methods', b'POST, OPTIONS'),
+            (b'access-control-allow-headers', b'Content-Type, Origin')
+        ]
+    await send({'type': 'http.response.start', 'status': 200, 'headers': headers + [(b'content-length', b'0')]})
+    await send({'type': 'http.response.body', 'body': b''})
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_async_http_client()
+            close_http_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def _serve_timed(handler, scope, receive, send):
+    """Run an async route handler, recording the same request metrics as the Flask hooks."""
+    started = time.perf_counter()
+    status = 500
+
+    async def send_and_capture(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            if status == 429:
+                rate_limit_rejections.inc(route=handler.__name__)
+        await send(message)
+
+    try:
+        await handler(scope, receive, send_and_capture)
+    finally:
+        http_request_seconds.observe(time.perf_counter() - started, route=handler.__name__, method='POST', status=status)
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' else None
+    if handler is None:
+        await flask_application(scope, receive, send)
+    elif scope['method'] == 'OPTIONS':
+        await _preflight(scope, send)
+    elif scope['method'] == 'POST':
+        begin_request(handler.__name__)
+        await _serve_timed(handler, scope, receive, send)
+    else:
+        await _send_json(scope, send, 405, {"error": "Method not allowed"}, headers=[(b'allow', b'POST, OPTIONS')])
@@ -0,0 +1,83 @@
+"""Benchmark predefined-recipe matching: linear catalog scan vs. the ingredient index.
+
+Usage: python benchmarks/bench_ingredient_index.py [--sizes 10000 100000] [--queries 2000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import CatalogRecipe, Nutrition, RecipeIngredient
+from ingredient_index import build_index
+
+VOCABULARY_SIZE = 400
+
+def synthetic_catalog(size, rng):
+    """Build a catalog whose ingredient popularity roughly follows a Zipf curve."""
+    vocabulary = [f"ingredient-{i}" for i in range(VOCABULARY_SIZE)]
+    weights = [1.0 / (rank + 1) for rank in range(VOCABULARY_SIZE)]
+    recipes = []
+    for recipe_id in range(1, size + 1):
+        names = sorted(set(rng.choices(vocabulary, weights=weights, k=rng.randint(4, 8))))
+        recipes.append(CatalogRecipe(
+            id=recipe_id, title_en=f"Recipe {recipe_id}", title_es=None,
+            ingredients=tuple(RecipeIngredient(name, '1 cup') for name in names),
+            steps=('Cook it.',), nutrition=Nutrition(), cooking_time=10,
+            difficulty='easy', equipment=('pot',), servings=2, tips=''
+        ))
+    return tuple(recipes), vocabulary, weights
+
+def linear_match(recipes, ingredients):
+    """The pre-index matcher: score every recipe, keep the best full match."""
+    scored = [(recipe, len(set(ingredients).intersection({ing.name for ing in recipe.ingredients}))) for recipe in recipes]
+    best_recipe, best_score = max(scored, key=lambda x: x[1])
+    return best_recipe if best_score >= len(ingredients) else None
+
+def time_queries(match, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        match(query)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        'mean_us': statistics.fmean(timings),
+        'p50_us': timings[len(timings) // 2],
+        'p99_us': timings[int(len(timings) * 0.99) - 1]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--linear-queries', type=int, default=50, help='queries for the slow linear baseline')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        recipes, vocabulary, weights = synthetic_catalog(size, rng)
+        queries = [list(dict.fromkeys(rng.choices(vocabulary, weights=weights, k=rng.randint(1, 3)))) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        index = build_index(recipes[:-100])
+        for recipe in recipes[-100:]:
+            index.add_recipe(recipe)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        for query in queries[:args.linear_queries]:
+            expected = linear_match(recipes, query)
+            assert index.first_match(query) == expected, f"index disagrees with linear scan for {query}"
+
+        indexed = time_queries(index.first_match, queries)
+        linear = time_queries(lambda q: linear_match(recipes, q), queries[:args.linear_queries])
+        print(f"{size:>7} recipes  build {build_ms:8.1f} ms")
+        print(f"         linear  mean {linear['mean_us']:10.1f} us  p50 {linear['p50_us']:10.1f} us  p99 {linear['p99_us']:10.1f} us")
+        print(f"         index   mean {indexed['mean_us']:10.1f} us  p50 {indexed['p50_us']:10.1f} us  p99 {indexed['p99_us']:10.1f} us")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the rate limiter storages and check limits hold across processes.
+
+Measures the per-hit cost of memory:// and the shared sqlite:// storage for the
+fixed and sliding window strategies, then has several processes hammer one key
+and counts how many hits were allowed: with memory:// every process gets the full
+limit, with sqlite:// the total stays at the limit.
+
+Usage: python benchmarks/bench_rate_limiter.py [--hits 20000] [--processes 4] [--limit 100]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import parse
+from limits.storage import storage_from_string
+from limits.strategies import STRATEGIES
+import limiter_storage  # registers the sqlite:// scheme
+
+def per_hit_us(uri, strategy, hits):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse(f"{hits * 10} per minute")
+    start = time.perf_counter()
+    for i in range(hits):
+        limiter.hit(item, f"client-{i % 64}", 'generate_recipe')
+    return (time.perf_counter() - start) / hits * 1e6
+
+def _hammer(uri, strategy, limit, attempts, results):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse(f"{limit} per hour")
+    results.put(sum(limiter.hit(item, 'shared-client', 'generate_recipe') for _ in range(attempts)))
+
+def allowed_across_processes(uri, strategy, processes, limit):
+    ctx = multiprocessing.get_context('fork')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_hammer, args=(uri, strategy, limit, limit * 2, results)) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    allowed = sum(results.get() for _ in workers)
+    for worker in workers:
+        worker.join()
+    return allowed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hits', type=int, default=20000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--limit', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for strategy in ('fixed-window', 'sliding-window-counter'):
+            for label, uri in (('memory://', 'memory://'), ('sqlite://', f"sqlite:///{tmp}/{strategy}.db")):
+                cost = per_hit_us(uri, strategy, args.hits)
+                allowed = allowed_across_processes(uri, strategy, args.processes, args.limit)
+                print(f"{strategy:24} {label:10} {cost:7.1f} us/hit  allowed {allowed:5} of limit {args.limit} "
+                      f"across {args.processes} processes")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark top-k similar-recipe retrieval: per-recipe Python scoring vs. the sparse matrix.
+
+Also reports how many queries would be served a close predefined match at a
+range of thresholds, to help pick RECIPE_MATCH_THRESHOLD.
+
+Usage: python benchmarks/bench_recipe_similarity.py [--sizes 10000 100000] [--queries 2000] [--metric jaccard]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_ingredient_index import synthetic_catalog, time_queries
+from recipe_similarity import SimilarityIndex
+
+THRESHOLDS = (0.2, 0.3, 0.4, 0.5, 0.6)
+SCORE_TOLERANCE = 1e-9
+
+def python_top_k(recipes, idf, unknown_idf, ingredients, k, metric):
+    """Score every recipe with plain sets and dicts; the baseline the matrix replaces."""
+    query = set(ingredients)
+    weight = lambda name: idf.get(name, unknown_idf)
+    scored = []
+    for slot, recipe in enumerate(recipes):
+        names = {ing.name for ing in recipe.ingredients}
+        shared = query & names
+        if not shared:
+            continue
+        if metric == 'cosine':
+            score = sum(weight(n) ** 2 for n in shared) / math.sqrt(
+                sum(weight(n) ** 2 for n in query) * sum(weight(n) ** 2 for n in names))
+        else:
+            score = sum(weight(n) for n in shared) / sum(weight(n) for n in query | names)
+        scored.append((-round(score, 12), slot))
+    scored.sort()
+    return [(recipes[slot], -score) for score, slot in scored[:k]]
+
+def same_ranking(got, expected):
+    """Compare (recipe, score) rankings: scores within tolerance, ids equal unless tied on score."""
+    if len(got) != len(expected):
+        return False
+    for i, ((got_recipe, got_score), (expected_recipe, expected_score)) in enumerate(zip(got, expected)):
+        if abs(got_score - expected_score) > SCORE_TOLERANCE:
+            return False
+        tied = any(abs(expected[j][1] - expected_score) <= SCORE_TOLERANCE for j in (i - 1, i + 1) if 0 <= j < len(expected))
+        if got_recipe.id != expected_recipe.id and not tied:
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--python-queries', type=int, default=50, help='queries for the slow Python baseline')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--metric', choices=['jaccard', 'cosine'], default='jaccard')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        rng = random.Random(args.seed)
+        recipes, vocabulary, weights = synthetic_catalog(size, rng)
+        queries = [list(dict.fromkeys(rng.choices(vocabulary, weights=weights, k=rng.randint(2, 5)))) for _ in range(args.queries)]
+
+        start = time.perf_counter()
+        index = SimilarityIndex(recipes)
+        build_ms = (time.perf_counter() - start) * 1e3
+        idf = {name: float(index.idf[i]) for name, i in index.ingredient_ids.items()}
+
+        for query in queries[:args.python_queries]:
+            expected = python_top_k(recipes, idf, index.unknown_idf, query, args.k, args.metric)
+            got = index.top_k(query, args.k, args.metric)
+            assert same_ranking(got, expected), f"matrix disagrees with Python scoring for {query}"
+
+        matrix = time_queries(lambda q: index.top_k(q, args.k, args.metric), queries)
+        baseline = time_queries(lambda q: python_top_k(recipes, idf, index.unknown_idf, q, args.k, args.metric),
+                                queries[:args.python_queries])
+        best = [index.top_k(q, 1, args.metric) for q in queries]
+        served = '  '.join(f">={t}: {sum(1 for m in best if m and m[0][1] >= t) / len(best):5.1%}" for t in THRESHOLDS)
+        print(f"{size:>7} recipes  build {build_ms:8.1f} ms  ({args.metric}, k={args.k})")
+        print(f"         python  mean {baseline['mean_us']:10.1f} us  p50 {baseline['p50_us']:10.1f} us  p99 {baseline['p99_us']:10.1f} us")
+        print(f"         matrix  mean {matrix['mean_us']:10.1f} us  p50 {matrix['p50_us']:10.1f} us  p99 {matrix['p99_us']:10.1f} us")
+        print(f"         served  {served}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Benchmark mixed /recipe_comments reads and /rate_recipe writes against SQLite.
+
+Runs the same workload twice: once with the original connection-per-call setup
+(rollback journal, default pragmas) and its SELECT-then-UPDATE rating write, and
+once with the pooled WAL connections and atomic rating UPDATE in database.py.
+
+Usage: python benchmarks/bench_sqlite_concurrency.py [--threads 8] [--seconds 5] [--write-ratio 0.2]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+def legacy_connection():
+    """The connection factory database.py used before pooling: a fresh connection per call."""
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def legacy_update_recipe_rating(recipe_id, rating, comment):
+    """The rating write database.py used before: read the average, then write it back."""
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT rating, rating_count FROM recipes WHERE id = ?', (recipe_id,))
+        result = cursor.fetchone()
+        if not result:
+            raise ValueError(f"Recipe with id {recipe_id} not found")
+        new_count = result['rating_count'] + 1
+        new_rating = ((result['rating'] * result['rating_count']) + rating) / new_count
+        cursor.execute('UPDATE recipes SET rating = ?, rating_count = ? WHERE id = ?', (new_rating, new_count, recipe_id))
+        if comment:
+            cursor.execute('INSERT INTO recipe_comments (recipe_id, comment) VALUES (?, ?)', (recipe_id, comment))
+        conn.commit()
+
+def run_workload(threads, seconds, write_ratio, update_rating):
+    recipe_ids = [1, 2, 3, 4, 5]
+    stop = threading.Event()
+    results = []
+    lock = threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        reads, writes, errors, latencies = 0, 0, 0, []
+        while not stop.is_set():
+            recipe_id = rng.choice(recipe_ids)
+            start = time.perf_counter()
+            try:
+                if rng.random() < write_ratio:
+                    update_rating(recipe_id, rng.randint(1, 5), 'benchmark comment')
+                    writes += 1
+                else:
+                    database.get_recipe_comments_page(recipe_id, 50)
+                    reads += 1
+            except (sqlite3.Error, ValueError):
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        database.close_db_connection()
+        with lock:
+            results.append((reads, writes, errors, latencies))
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in workers:
+        thread.join()
+
+    reads = sum(r[0] for r in results)
+    writes = sum(r[1] for r in results)
+    errors = sum(r[2] for r in results)
+    latencies = sorted(latency for r in results for latency in r[3])
+    return {
+        'ops_per_sec': (reads + writes) / seconds,
+        'reads': reads,
+        'writes': writes,
+        'errors': errors,
+        'p50_ms': latencies[len(latencies) // 2] * 1e3 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1e3 if latencies else 0.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    args = parser.parse_args()
+
+    pooled_connection = database.get_db_connection
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = (
+            ('before (connection per call)', legacy_connection, legacy_update_recipe_rating),
+            ('after (pooled WAL)', pooled_connection, database.update_recipe_rating)
+        )
+        for label, factory, update_rating in runs:
+            database.DB_PATH = os.path.join(tmp, f"{label.split()[0]}.db")
+            database.get_db_connection = factory
+            database.init_db()
+            database.close_db_connection()
+            stats = run_workload(args.threads, args.seconds, args.write_ratio, update_rating)
+            print(f"{label:30} {stats['ops_per_sec']:9.0f} ops/s  reads {stats['reads']:7}  writes {stats['writes']:6}  "
+                  f"errors {stats['errors']:4}  p50 {stats['p50_ms']:7.2f} ms  p99 {stats['p99_ms']:7.2f} ms")
+    database.get_db_connection = pooled_connection
+
+if __name__ == '__main__':
+    main()
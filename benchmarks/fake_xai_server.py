@@ -0,0 +1,140 @@
+"""Local stand-in for the xAI chat completions API, for benchmarks.
+
+Answers POST /v1/chat/completions after a configurable latency, streams SSE chunks
+when the request asks for "stream": true, returns a JSON recipe when it sets a
+response_format, and can inject 503 errors or hung requests at a given rate.
+Point the app at it with XAI_API_URL=http://127.0.0.1:<port>/v1/chat/completions.
+
+Usage: python benchmarks/fake_xai_server.py [--port 8099] [--latency-ms 800] [--jitter-ms 200]
+           [--chunks 20] [--failure-rate 0.0] [--hang-rate 0.0]
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RECIPE_TEXT = (
+    "### **Benchmark Bayou Skillet** 🎉\n\n**Ingredients:** 🥗\n- 1 lb okra 🥄\n- 2 cups rice 🍚\n\n"
+    "**Steps:** 🔢\n1. Fry it up ✅\n2. Serve it hot ✅\n\n**Cooking Time:** ⏰ 20 minutes\n\n"
+    "**Tips:** 💡\n- Benchmarks taste better with hot sauce."
+)
+
+STRUCTURED_RECIPE = {
+    "title_en": "Benchmark Bayou Skillet", "title_es": "Sartén del Pantano de Prueba",
+    "ingredients": [{"name": "okra", "amount": "1 lb"}, {"name": "rice", "amount": "2 cups"}],
+    "steps": ["Fry it up.", "Serve it hot."],
+    "nutrition": {"calories": 450, "protein": 12, "fat": 9, "chaos_factor": 6},
+    "cooking_time": 20, "difficulty": "easy", "equipment": ["skillet"], "servings": 2,
+    "tips": "Benchmarks taste better with hot sauce."
+}
+
+class FakeXAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = {'latency_ms': 800.0, 'jitter_ms': 200.0, 'chunks': 20, 'failure_rate': 0.0, 'hang_rate': 0.0}
+    counters = {'requests': 0, 'streams': 0, 'failures': 0, 'hangs': 0}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def _latency(self):
+        settings = self.settings
+        return max(0.0, random.gauss(settings['latency_ms'], settings['jitter_ms'])) / 1000
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send_json(200, {**self.settings, **self.counters})
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self._count('requests')
+        roll = random.random()
+        if roll < self.settings['hang_rate']:
+            # Hold the connection past any sane client read timeout
+            self._count('hangs')
+            time.sleep(3600)
+            return
+        if roll < self.settings['hang_rate'] + self.settings['failure_rate']:
+            self._count('failures')
+            time.sleep(self._latency() / 10)
+            self._send_json(503, {"error": "injected failure"})
+            return
+        if payload.get('stream'):
+            self._count('streams')
+            self._stream()
+            return
+        time.sleep(self._latency())
+        content = json.dumps(STRUCTURED_RECIPE) if payload.get('response_format') else RECIPE_TEXT
+        self._send_json(200, {
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 180, "completion_tokens": len(content) // 4}
+        })
+
+    def _stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        chunks = max(1, self.settings['chunks'])
+        size = -(-len(RECIPE_TEXT) // chunks)
+        delay = self._latency() / chunks
+        for start in range(0, len(RECIPE_TEXT), size):
+            time.sleep(delay)
+            data = json.dumps({"choices": [{"delta": {"content": RECIPE_TEXT[start:start + size]}}]})
+            self._write_chunk(f"data: {data}\n\n".encode('utf-8'))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+class FakeXAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop streams right after [DONE]; that is not worth a traceback
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def start_fake_server(port=0, **settings):
+    """Start the fake server on a background thread; returns the server (server.server_port)."""
+    FakeXAIHandler.settings = {**FakeXAIHandler.settings, **settings}
+    server = FakeXAIServer(('127.0.0.1', port), FakeXAIHandler)
+    threading.Thread(target=server.serve_forever, name='fake-xai', daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency-ms', type=float, default=800.0)
+    parser.add_argument('--jitter-ms', type=float, default=200.0)
+    parser.add_argument('--chunks', type=int, default=20)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_fake_server(args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, chunks=args.chunks,
+                               failure_rate=args.failure_rate, hang_rate=args.hang_rate)
+    print(f"Fake xAI listening on http://127.0.0.1:{server.server_port}/v1/chat/completions")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
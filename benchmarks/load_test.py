@@ -0,0 +1,234 @@
+"""Load and latency benchmark for the HTTP endpoints against a fake xAI server.
+
+Starts benchmarks/fake_xai_server.py in-process, runs the app in a subprocess
+(in a scratch directory, so it gets its own recipes.db) with XAI_API_URL pointed at
+the fake and rate limiting off, then drives each endpoint at each concurrency level
+for a fixed duration. p50/p95/p99 latency, requests per second and status counts
+are printed and written to a JSON file so runs can be compared.
+
+Usage: python benchmarks/load_test.py [--server werkzeug|gunicorn|uvicorn] [--workers 2]
+           [--endpoints generate_recipe,ingredients,...] [--concurrency 1,8,32] [--duration 10]
+           [--latency-ms 800] [--failure-rate 0.0] [--cache-hit-ratio 0.0] [--output load_results.json]
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_xai_server import FakeXAIHandler, start_fake_server
+
+def _generate_recipe(client, rng, n, args):
+    hot = rng.random() < args.cache_hit_ratio
+    ingredients = ['okra', 'bench-hot' if hot else f"bench-{n}-{rng.random()}"]
+    return client.post('/generate_recipe', json={'ingredients': ingredients})
+
+def _generate_recipe_stream(client, rng, n, args):
+    with client.stream('POST', '/generate_recipe/stream', json={'ingredients': ['okra', f"bench-{n}-{rng.random()}"]}) as response:
+        for _ in response.iter_bytes():
+            pass
+    return response
+
+def _ingredients(client, rng, n, args):
+    return client.get('/ingredients')
+
+def _rate_recipe(client, rng, n, args):
+    return client.post('/rate_recipe', json={'recipe_id': rng.randint(1, 5), 'rating': rng.randint(1, 5), 'comment': 'load test'})
+
+def _recipe_comments(client, rng, n, args):
+    return client.get('/recipe_comments', params={'recipe_id': rng.randint(1, 5), 'limit': 50})
+
+# Served from the frontend build, which is not checked in (npm run build in rg_new_app)
+STATIC_ASSET = 'assets/favicon.png'
+STATIC_ROOT = os.path.join(ROOT, 'rg_new_app', 'dist')
+
+def _static(client, rng, n, args):
+    return client.get(f'/{STATIC_ASSET}')
+
+ENDPOINTS = {
+    'generate_recipe': _generate_recipe,
+    'generate_recipe_stream': _generate_recipe_stream,
+    'ingredients': _ingredients,
+    'rate_recipe': _rate_recipe,
+    'recipe_comments': _recipe_comments,
+    'static': _static
+}
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_app(args, xai_port, workdir):
+    """Start the app under the chosen server in a subprocess and wait until it answers."""
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        XAI_API_URL=f"http://127.0.0.1:{xai_port}/v1/chat/completions",
+        XAI_API_KEY='benchmark',
+        RATE_LIMIT_ENABLED='false',
+        RANDOM_POOL_ENABLED='false',
+        LOG_LEVEL='WARNING',
+        LOG_CONSOLE='false',
+        LOG_FILE=''
+    )
+    bind = f"127.0.0.1:{port}"
+    gunicorn = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '-b', bind, '-w', str(args.workers)]
+    commands = {
+        'werkzeug': [sys.executable, '-c', f"from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"],
+        'gunicorn': gunicorn + ['-k', 'gthread', '--threads', str(args.threads), 'app:app'],
+        'uvicorn': gunicorn + ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:application']
+    }
+    stderr_path = os.path.join(workdir, 'app.stderr')
+    with open(stderr_path, 'wb') as stderr:
+        process = subprocess.Popen(commands[args.server], cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+    base_url = f"http://{bind}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(stderr_path, errors='replace') as f:
+                raise RuntimeError(f"App exited during startup: {f.read()[-2000:]}")
+        try:
+            if httpx.get(f"{base_url}/api", timeout=1).status_code == 200:
+                return process, base_url
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("App did not become ready within 30s")
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))]
+
+def run_level(base_url, name, concurrency, args):
+    """Drive one endpoint with `concurrency` closed-loop clients; returns the summary dict."""
+    request_fn = ENDPOINTS[name]
+    measure_from = time.monotonic() + args.warmup
+    stop_at = measure_from + args.duration
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local_latencies, local_statuses, n = [], Counter(), 0
+        with httpx.Client(base_url=base_url, timeout=args.timeout) as client:
+            while True:
+                start = time.monotonic()
+                if start >= stop_at:
+                    break
+                try:
+                    status = request_fn(client, rng, f"{seed}-{n}", args).status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                end = time.monotonic()
+                n += 1
+                if start >= measure_from:
+                    local_latencies.append(end - start)
+                    local_statuses[status] += 1
+        with lock:
+            latencies.extend(local_latencies)
+            statuses.update(local_statuses)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400))
+    return {
+        'endpoint': name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'status_counts': {str(status): count for status, count in statuses.items()},
+        'rps': len(latencies) / args.duration,
+        'p50_ms': _percentile(latencies, 0.50) * 1e3,
+        'p95_ms': _percentile(latencies, 0.95) * 1e3,
+        'p99_ms': _percentile(latencies, 0.99) * 1e3,
+        'max_ms': latencies[-1] * 1e3 if latencies else 0.0
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--server', choices=['werkzeug', 'gunicorn', 'uvicorn'], default='werkzeug')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=16, help='threads per gunicorn gthread worker')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+    parser.add_argument('--concurrency', default='1,8,32')
+    parser.add_argument('--duration', type=float, default=10.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=1.0, help='unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--latency-ms', type=float, default=800.0, help='fake xAI mean latency')
+    parser.add_argument('--jitter-ms', type=float, default=200.0)
+    parser.add_argument('--chunks', type=int, default=20, help='SSE chunks per streamed completion')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='share of xAI calls answered with 503')
+    parser.add_argument('--hang-rate', type=float, default=0.0, help='share of xAI calls that never answer')
+    parser.add_argument('--cache-hit-ratio', type=float, default=0.0, help='share of /generate_recipe calls repeating one request')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default='load_results.json')
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if 'static' in endpoints and not os.path.isfile(os.path.join(STATIC_ROOT, STATIC_ASSET)):
+        print(f"Skipping static: {os.path.join(STATIC_ROOT, STATIC_ASSET)} not found; build the frontend first "
+              "(cd rg_new_app && npm run build)", file=sys.stderr)
+        endpoints.remove('static')
+    levels = [int(level) for level in args.concurrency.split(',')]
+    random.seed(args.seed)
+
+    fake = start_fake_server(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, chunks=args.chunks,
+                             failure_rate=args.failure_rate, hang_rate=args.hang_rate)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        process, base_url = start_app(args, fake.server_port, workdir)
+        try:
+            for name in endpoints:
+                for concurrency in levels:
+                    stats = run_level(base_url, name, concurrency, args)
+                    results.append(stats)
+                    print(f"{name:24} c={concurrency:<4} {stats['rps']:8.1f} rps  p50 {stats['p50_ms']:8.1f}  "
+                          f"p95 {stats['p95_ms']:8.1f}  p99 {stats['p99_ms']:8.1f} ms  errors {stats['errors']}")
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    fake.shutdown()
+
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'config': vars(args),
+        'fake_xai': dict(FakeXAIHandler.counters),
+        'results': results
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -1,28 +1,110 @@
+import atexit
+import base64
+import binascii
 import sqlite3
 import logging
 import os
 import json
+import threading
+import time
+from collections import namedtuple
 from datetime import datetime
-
-# Configure logging
-logging.basicConfig(
-    filename='recipe_generator.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s - %(pathname)s:%(lineno)d'
-)
+from metrics import timed_query
 
 DB_PATH = 'recipes.db'
 
+# Connection tuning; each thread keeps one connection with these settings
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+DB_STATEMENT_CACHE = 256
+
+_local = threading.local()
+
+_rating_lock = threading.Lock()
+_rating_buffer = []
+_pending_rating_keys = set()
+_rating_flush_wakeup = threading.Event()
+_rating_flusher = None
+_rating_flusher_pid = None
+_last_rating_prune = 0.0
+
+# Immutable, decoded records held by the in-process recipe catalog cache
+RecipeIngredient = namedtuple('RecipeIngredient', ['name', 'amount'])
+Nutrition = namedtuple('Nutrition', ['calories', 'protein', 'fat', 'chaos_factor'], defaults=(0, 0, 0, 0))
+CatalogRecipe = namedtuple('CatalogRecipe', [
+    'id', 'title_en', 'title_es', 'ingredients', 'steps', 'nutrition',
+    'cooking_time', 'difficulty', 'equipment', 'servings', 'tips'
+])
+
+# Only the columns needed to match and render predefined recipes
+CATALOG_COLUMNS = 'id, title_en, title_es, ingredients, steps, nutrition, cooking_time, difficulty, equipment, servings, tips'
+
+# Tables whose writes bump a version counter in table_versions, with the columns
+# whose updates count (None for any column). Rating columns are not cached, so
+# rating writes leave the recipes version alone.
+VERSIONED_TABLES = {
+    'recipes': ['title_en', 'title_es', 'ingredients', 'steps', 'nutrition', 'cooking_time', 'difficulty', 'equipment', 'servings', 'tips'],
+    'flavor_pairs': None,
+}
+
+# Write-behind buffering for ratings and comments
+RATING_WRITE_BEHIND = os.getenv("RATING_WRITE_BEHIND", "false").lower() == "true"
+RATING_FLUSH_INTERVAL = float(os.getenv("RATING_FLUSH_INTERVAL", "0.5"))
+RATING_FLUSH_BATCH = int(os.getenv("RATING_FLUSH_BATCH", "500"))
+RATING_IDEMPOTENCY_TTL_HOURS = int(os.getenv("RATING_IDEMPOTENCY_TTL_HOURS", "24"))
+
+_catalog_lock = threading.Lock()
+_catalog_cache = (None, ())
+
+def _open_connection():
+    """Open a connection with WAL and the tuned pragmas applied."""
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000, cached_statements=DB_STATEMENT_CACHE)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
+
 def get_db_connection():
-    """Create and return a database connection."""
+    """Return this thread's database connection, opening it on first use.
+
+    Connections are reused per thread (and their prepared statements with them).
+    A connection is never shared across a fork: a child process, such as a gunicorn
+    worker forked from a preloading master, opens its own.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = getattr(_local, 'conn', None)
+        if conn is None or _local.pid != os.getpid() or _local.path != DB_PATH:
+            conn = _open_connection()
+            _local.conn, _local.pid, _local.path = conn, os.getpid(), DB_PATH
         return conn
     except sqlite3.Error as e:
         logging.error(f"Database connection error: {str(e)}")
         raise
 
+def close_db_connection():
+    """Close this thread's database connection, if it owns one."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.pid == os.getpid():
+        conn.close()
+    _local.conn = None
+
+def _create_version_triggers(cursor, table, update_columns=None):
+    """Create the triggers that bump a table's version on insert, update and delete."""
+    update_event = f"UPDATE OF {', '.join(update_columns)}" if update_columns else 'UPDATE'
+    for name, event in (('insert', 'INSERT'), ('update', update_event), ('delete', 'DELETE')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_version_{name}
+            AFTER {event} ON {table}
+            BEGIN
+                UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+            END
+        ''')
+
 def init_db():
     """Initialize the database with recipes and flavor_pairs tables."""
     try:
@@ -67,6 +149,30 @@ def init_db():
                 )
             ''')
 
+            # Create table_versions table; triggers bump the counter on every write so
+            # each worker can tell when its cached copy of a table is stale
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS table_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            for table, update_columns in VERSIONED_TABLES.items():
+                cursor.execute('INSERT OR IGNORE INTO table_versions (name, version) VALUES (?, 0)', (table,))
+                _create_version_triggers(cursor, table, update_columns)
+
+            # Create llm_response_cache table, the persistent tier of response_cache
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    cache_key TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_response_cache_key ON llm_response_cache (cache_key, created_at)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_llm_response_cache_created ON llm_response_cache (created_at)')
+
             # Check if recipes table is empty
             cursor.execute('SELECT COUNT(*) FROM recipes')
             if cursor.fetchone()[0] == 0:
@@ -372,11 +478,14 @@ def init_db():
                 conn.commit()
                 logging.info(f"Inserted {len(predefined_recipes)} recipes into the database")
 
+            migrate_db(conn)
+
         logging.info("Database initialized successfully")
     except sqlite3.Error as e:
         logging.error(f"Database initialization error: {str(e)}")
         raise
 
+@timed_query
 def get_all_recipes():
     """Fetch all recipes from the database."""
     try:
@@ -402,6 +511,240 @@ def get_all_recipes():
         logging.error(f"Error fetching recipes: {str(e)}")
         return []
 
+def _ingredient_rows_sql(recipe_id, ingredients, from_recipes=False):
+    """SELECT yielding (recipe_id, name, position, amount) for a JSON ingredients column.
+
+    Ingredients are stored either as {"name", "amount"} objects or [name, amount] pairs;
+    invalid JSON yields no rows. With from_recipes, the rows cover every recipe.
+    """
+    return f'''
+        SELECT {recipe_id} AS recipe_id,
+               CASE json_type(je.value) WHEN 'array' THEN json_extract(je.value, '$[0]') ELSE json_extract(je.value, '$.name') END AS name,
+               je.key AS position,
+               CASE json_type(je.value) WHEN 'array' THEN json_extract(je.value, '$[1]') ELSE json_extract(je.value, '$.amount') END AS amount
+        FROM {'recipes, ' if from_recipes else ''}json_each(CASE WHEN json_valid({ingredients}) THEN {ingredients} ELSE '[]' END) AS je
+    '''
+
+def _insert_recipe_ingredients_sql(recipe_id, ingredients, from_recipes=False):
+    """Statements that add recipe ingredients to the ingredients and recipe_ingredients tables."""
+    rows = _ingredient_rows_sql(recipe_id, ingredients, from_recipes)
+    return [
+        f'INSERT OR IGNORE INTO ingredients (name) SELECT name FROM ({rows}) WHERE name IS NOT NULL',
+        f'''
+            INSERT OR IGNORE INTO recipe_ingredients (recipe_id, ingredient_id, position, amount)
+            SELECT r.recipe_id, i.id, r.position, r.amount
+            FROM ({rows}) AS r
+            JOIN ingredients i ON i.name = r.name
+        '''
+    ]
+
+def _migrate_v1_recipe_ingredients(cursor):
+    """Add normalized ingredients/recipe_ingredients tables and backfill them from the JSON column."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS ingredients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    # The primary key covers recipe -> ingredients; the index covers ingredient -> recipes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recipe_ingredients (
+            recipe_id INTEGER NOT NULL,
+            ingredient_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            amount TEXT,
+            PRIMARY KEY (recipe_id, ingredient_id),
+            FOREIGN KEY (recipe_id) REFERENCES recipes(id),
+            FOREIGN KEY (ingredient_id) REFERENCES ingredients(id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient ON recipe_ingredients (ingredient_id, recipe_id)')
+
+    # Keep the child rows in sync with the JSON column on every write path
+    insert_rows = ";\n".join(_insert_recipe_ingredients_sql('NEW.id', 'NEW.ingredients'))
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS recipes_ingredients_insert AFTER INSERT ON recipes
+        BEGIN
+            {insert_rows};
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS recipes_ingredients_update AFTER UPDATE OF ingredients ON recipes
+        BEGIN
+            DELETE FROM recipe_ingredients WHERE recipe_id = OLD.id;
+            {insert_rows};
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS recipes_ingredients_delete AFTER DELETE ON recipes
+        BEGIN
+            DELETE FROM recipe_ingredients WHERE recipe_id = OLD.id;
+        END
+    ''')
+
+    # Backfill existing recipes
+    for statement in _insert_recipe_ingredients_sql('recipes.id', 'recipes.ingredients', from_recipes=True):
+        cursor.execute(statement)
+
+def _migrate_v2_rating_aggregates(cursor):
+    """Store rating sums for atomic aggregation and add the rating idempotency table."""
+    cursor.execute('ALTER TABLE recipes ADD COLUMN rating_sum REAL NOT NULL DEFAULT 0.0')
+    cursor.execute('UPDATE recipes SET rating_sum = COALESCE(rating, 0) * COALESCE(rating_count, 0)')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rating_requests (
+            idempotency_key TEXT PRIMARY KEY,
+            recipe_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_rating_requests_created ON rating_requests (created_at)')
+    # Older databases bump the recipes version on any update, including ratings
+    cursor.execute('DROP TRIGGER IF EXISTS recipes_version_update')
+    _create_version_triggers(cursor, 'recipes', VERSIONED_TABLES['recipes'])
+
+def _migrate_v3_comment_index(cursor):
+    """Index comments for keyset pagination by recipe."""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_recipe_comments_recipe_created ON recipe_comments (recipe_id, created_at, id)')
+
+def _migrate_v4_generated_recipes(cursor):
+    """Tag recipes written back from xAI generations with their request key, at most one per key."""
+    cursor.execute('ALTER TABLE recipes ADD COLUMN generation_key TEXT')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_recipes_generation_key ON recipes (generation_key) WHERE generation_key IS NOT NULL')
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+MIGRATIONS = [
+    (1, _migrate_v1_recipe_ingredients),
+    (2, _migrate_v2_rating_aggregates),
+    (3, _migrate_v3_comment_index),
+    (4, _migrate_v4_generated_recipes),
+]
+
+def migrate_db(conn):
+    """Apply any pending schema migrations, each in its own transaction."""
+    conn.commit()
+    cursor = conn.cursor()
+    for version, migration in MIGRATIONS:
+        if cursor.execute('PRAGMA user_version').fetchone()[0] >= version:
+            continue
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            # Another worker may have migrated while we waited for the write lock
+            if cursor.execute('PRAGMA user_version').fetchone()[0] < version:
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {version}')
+                logging.info(f"Applied database migration {version}: {migration.__name__}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+@timed_query
+def find_recipes_with_ingredients(names, limit):
+    """Return id and titles of up to `limit` recipes containing every named ingredient.
+
+    Runs on the normalized tables: the ingredients name index finds the ingredient ids
+    and idx_recipe_ingredients_ingredient their recipes, so no recipe JSON is scanned.
+    """
+    names = sorted(set(names))
+    if not names:
+        return []
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            placeholders = ", ".join("?" for _ in names)
+            cursor.execute(f'''
+                SELECT r.id, r.title_en, r.title_es
+                FROM recipes r
+                JOIN (
+                    SELECT ri.recipe_id
+                    FROM ingredients i
+                    JOIN recipe_ingredients ri ON ri.ingredient_id = i.id
+                    WHERE i.name IN ({placeholders})
+                    GROUP BY ri.recipe_id
+                    HAVING COUNT(*) = ?
+                ) matched ON matched.recipe_id = r.id
+                ORDER BY r.id
+                LIMIT ?
+            ''', (*names, len(names), limit))
+            return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logging.error(f"Error finding recipes by ingredients: {str(e)}")
+        return []
+
+@timed_query
+def get_table_version(table):
+    """Return the write version counter for a table, or None if it is unavailable."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT version FROM table_versions WHERE name = ?', (table,))
+            row = cursor.fetchone()
+            return row['version'] if row else None
+    except sqlite3.Error as e:
+        logging.error(f"Error fetching version for table {table}: {str(e)}")
+        return None
+
+def _decode_catalog_recipe(row):
+    """Decode a recipes row into an immutable CatalogRecipe."""
+    ingredients = json.loads(row['ingredients'])
+    steps = json.loads(row['steps'])
+    nutrition = json.loads(row['nutrition']) if row['nutrition'] else {}
+    equipment = json.loads(row['equipment']) if row['equipment'] else []
+    return CatalogRecipe(
+        id=row['id'],
+        title_en=row['title_en'],
+        title_es=row['title_es'],
+        ingredients=tuple(
+            RecipeIngredient(ing['name'], ing.get('amount', '')) if isinstance(ing, dict)
+            else RecipeIngredient(ing[0], ing[1] if len(ing) > 1 else '')
+            for ing in ingredients
+        ),
+        steps=tuple(steps),
+        nutrition=Nutrition(**{field: nutrition[field] for field in Nutrition._fields if field in nutrition}),
+        cooking_time=row['cooking_time'],
+        difficulty=row['difficulty'],
+        equipment=tuple(equipment),
+        servings=row['servings'],
+        tips=row['tips']
+    )
+
+@timed_query
+def _load_recipe_catalog():
+    """Read and decode the catalog columns of every recipe."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT {CATALOG_COLUMNS} FROM recipes')
+        recipes = []
+        for row in cursor.fetchall():
+            try:
+                recipes.append(_decode_catalog_recipe(row))
+            except (json.JSONDecodeError, KeyError, IndexError, TypeError) as e:
+                logging.warning(f"Skipping invalid recipe data for id {row['id']}: {str(e)}")
+        return tuple(recipes)
+
+def get_recipe_catalog():
+    """Return the decoded recipe catalog, re-reading the table only when its version changes."""
+    global _catalog_cache
+    version = get_table_version('recipes')
+    cached_version, cached_recipes = _catalog_cache
+    if version is not None and version == cached_version:
+        return cached_recipes
+
+    try:
+        with _catalog_lock:
+            cached_version, cached_recipes = _catalog_cache
+            if version is not None and version == cached_version:
+                return cached_recipes
+            recipes = _load_recipe_catalog()
+            if version is not None:
+                _catalog_cache = (version, recipes)
+            logging.debug(f"Loaded {len(recipes)} recipes into catalog cache at version {version}")
+            return recipes
+    except sqlite3.Error as e:
+        logging.error(f"Error loading recipe catalog: {str(e)}")
+        return ()
+
+@timed_query
 def get_flavor_pairs():
     """Fetch all flavor pairs from the database."""
     try:
@@ -415,40 +758,77 @@ def get_flavor_pairs():
         logging.error(f"Error fetching flavor pairs: {str(e)}")
         return {}
 
-def update_recipe_rating(recipe_id, rating, comment):
-    """Update the rating and add a comment for a recipe."""
+def _apply_rating(cursor, recipe_id, rating, comment, idempotency_key):
+    """Apply one rating (and comment) in the current transaction.
+
+    Returns False when the idempotency key was already used, True when applied,
+    and raises ValueError for an unknown recipe.
+    """
+    if idempotency_key:
+        cursor.execute('INSERT OR IGNORE INTO rating_requests (idempotency_key, recipe_id) VALUES (?, ?)', (idempotency_key, recipe_id))
+        if cursor.rowcount == 0:
+            logging.info(f"Ignoring duplicate rating for recipe {recipe_id} with idempotency key {idempotency_key}")
+            return False
+
+    # A single statement reads and writes the aggregate, so concurrent ratings can't lose updates
+    cursor.execute('''
+        UPDATE recipes
+        SET rating_sum = rating_sum + ?,
+            rating_count = rating_count + 1,
+            rating = (rating_sum + ?) / (rating_count + 1)
+        WHERE id = ?
+    ''', (rating, rating, recipe_id))
+    if cursor.rowcount == 0:
+        # Give the key back: a batch that commits past this error must not burn it
+        if idempotency_key:
+            cursor.execute('DELETE FROM rating_requests WHERE idempotency_key = ?', (idempotency_key,))
+        raise ValueError(f"Recipe with id {recipe_id} not found")
+
+    if comment:
+        cursor.execute('''
+            INSERT INTO recipe_comments (recipe_id, comment)
+            VALUES (?, ?)
+        ''', (recipe_id, comment))
+    return True
+
+def _prune_rating_requests(cursor):
+    """Forget idempotency keys older than RATING_IDEMPOTENCY_TTL_HOURS."""
+    global _last_rating_prune
+    now = time.monotonic()
+    if now - _last_rating_prune < 300:
+        return
+    _last_rating_prune = now
+    cursor.execute("DELETE FROM rating_requests WHERE created_at < datetime('now', ?)", (f'-{RATING_IDEMPOTENCY_TTL_HOURS} hours',))
+
+@timed_query
+def recipe_exists(recipe_id):
+    """Check whether a recipe id exists."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM recipes WHERE id = ?', (recipe_id,))
+        return cursor.fetchone() is not None
+
+@timed_query
+def update_recipe_rating(recipe_id, rating, comment, idempotency_key=None):
+    """Update the rating and add a comment for a recipe.
+
+    With RATING_WRITE_BEHIND enabled the rating is validated and buffered, then
+    written by the background flusher in a batched transaction.
+    """
     try:
+        if RATING_WRITE_BEHIND:
+            if not recipe_exists(recipe_id):
+                raise ValueError(f"Recipe with id {recipe_id} not found")
+            _buffer_rating(recipe_id, rating, comment, idempotency_key)
+            return
+
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            # Get current rating and count
-            cursor.execute('SELECT rating, rating_count FROM recipes WHERE id = ?', (recipe_id,))
-            result = cursor.fetchone()
-            if not result:
-                raise ValueError(f"Recipe with id {recipe_id} not found")
-            
-            current_rating, rating_count = result['rating'], result['rating_count']
-            
-            # Calculate new rating
-            new_count = rating_count + 1
-            new_rating = ((current_rating * rating_count) + rating) / new_count
-            
-            # Update recipe rating
-            cursor.execute('''
-                UPDATE recipes
-                SET rating = ?, rating_count = ?
-                WHERE id = ?
-            ''', (new_rating, new_count, recipe_id))
-            
-            # Insert comment if provided
-            if comment:
-                cursor.execute('''
-                    INSERT INTO recipe_comments (recipe_id, comment)
-                    VALUES (?, ?)
-                ''', (recipe_id, comment))
-            
+            applied = _apply_rating(cursor, recipe_id, rating, comment, idempotency_key)
+            _prune_rating_requests(cursor)
             conn.commit()
-            logging.info(f"Updated rating for recipe {recipe_id}: new_average={new_rating}, new_count={new_count}, comment={comment}")
+            if applied:
+                logging.info(f"Updated rating for recipe {recipe_id}: rating={rating}, comment={comment}")
     except sqlite3.Error as e:
         logging.error(f"Error updating recipe rating: {str(e)}")
         raise
@@ -456,15 +836,187 @@ def update_recipe_rating(recipe_id, rating, comment):
         logging.error(f"Invalid recipe ID: {str(e)}")
         raise
 
-def get_recipe_comments(recipe_id):
-    """Fetch all comments for a specific recipe."""
+def _buffer_rating(recipe_id, rating, comment, idempotency_key):
+    """Queue a rating for the write-behind flusher, dropping retries already pending."""
+    global _rating_flusher, _rating_flusher_pid
+    with _rating_lock:
+        if idempotency_key and idempotency_key in _pending_rating_keys:
+            logging.info(f"Ignoring duplicate buffered rating with idempotency key {idempotency_key}")
+            return
+        if idempotency_key:
+            _pending_rating_keys.add(idempotency_key)
+        _rating_buffer.append((recipe_id, rating, comment, idempotency_key))
+        if _rating_flusher is None or _rating_flusher_pid != os.getpid() or not _rating_flusher.is_alive():
+            _rating_flusher = threading.Thread(target=_run_rating_flusher, name='rating-flusher', daemon=True)
+            _rating_flusher_pid = os.getpid()
+            _rating_flusher.start()
+        if len(_rating_buffer) >= RATING_FLUSH_BATCH:
+            _rating_flush_wakeup.set()
+
+@timed_query
+def flush_ratings():
+    """Write all buffered ratings and comments in one transaction."""
+    with _rating_lock:
+        batch = _rating_buffer[:]
+        del _rating_buffer[:]
+    if not batch:
+        return 0
+
+    applied = 0
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            for recipe_id, rating, comment, idempotency_key in batch:
+                try:
+                    applied += _apply_rating(cursor, recipe_id, rating, comment, idempotency_key)
+                except ValueError as e:
+                    logging.error(f"Dropping buffered rating: {str(e)}")
+            _prune_rating_requests(cursor)
+            conn.commit()
+        logging.info(f"Flushed {applied} of {len(batch)} buffered ratings")
+    except sqlite3.Error as e:
+        logging.error(f"Error flushing buffered ratings, requeueing {len(batch)}: {str(e)}")
+        with _rating_lock:
+            _rating_buffer[:0] = batch
+        return 0
+    finally:
+        with _rating_lock:
+            _pending_rating_keys.difference_update(key for _, _, _, key in batch if key)
+    return applied
+
+def _run_rating_flusher():
+    while True:
+        _rating_flush_wakeup.wait(RATING_FLUSH_INTERVAL)
+        _rating_flush_wakeup.clear()
+        try:
+            flush_ratings()
+        except Exception as e:
+            logging.error(f"Error in rating flusher: {str(e)}", exc_info=True)
+
+atexit.register(flush_ratings)
+
+@timed_query
+def insert_generated_recipes(recipes):
+    """Insert generated recipes in one transaction, skipping generation keys already stored.
+
+    Each recipe is a dict of the catalog columns (JSON columns already encoded) plus
+    generation_key. The insert triggers fill recipe_ingredients and bump the recipes
+    version. Returns the number of rows inserted.
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            inserted = 0
+            for recipe in recipes:
+                cursor.execute('''
+                    INSERT OR IGNORE INTO recipes (title_en, title_es, ingredients, steps, nutrition, cooking_time, difficulty, equipment, servings, tips, generation_key)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    recipe['title_en'],
+                    recipe['title_es'],
+                    recipe['ingredients'],
+                    recipe['steps'],
+                    recipe['nutrition'],
+                    recipe['cooking_time'],
+                    recipe['difficulty'],
+                    recipe['equipment'],
+                    recipe['servings'],
+                    recipe['tips'],
+                    recipe['generation_key']
+                ))
+                inserted += cursor.rowcount
+            conn.commit()
+            return inserted
+    except sqlite3.Error as e:
+        logging.error(f"Error inserting generated recipes: {str(e)}")
+        raise
+
+@timed_query
+def get_cached_responses(cache_key, min_created_at, limit):
+    """Fetch the newest unexpired cached LLM responses for a cache key."""
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT response, created_at FROM llm_response_cache
+                WHERE cache_key = ? AND created_at >= ?
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (cache_key, min_created_at, limit))
+            return [(row['response'], row['created_at']) for row in cursor.fetchall()]
+    except sqlite3.Error as e:
+        logging.error(f"Error fetching cached responses: {str(e)}")
+        return []
+
+@timed_query
+def store_cached_response(cache_key, response, created_at, max_variants, min_created_at):
+    """Store a cached LLM response, keeping at most max_variants per key and dropping expired rows."""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT comment, created_at FROM recipe_comments WHERE recipe_id = ?', (recipe_id,))
-            comments = [{'comment': row['comment'], 'created_at': row['created_at']} for row in cursor.fetchall()]
-            logging.debug(f"Fetched {len(comments)} comments for recipe_id {recipe_id}")
-            return comments
+            cursor.execute('''
+                INSERT INTO llm_response_cache (cache_key, response, created_at)
+                VALUES (?, ?, ?)
+            ''', (cache_key, response, created_at))
+            cursor.execute('''
+                DELETE FROM llm_response_cache
+                WHERE cache_key = ? AND id NOT IN (
+                    SELECT id FROM llm_response_cache WHERE cache_key = ? ORDER BY created_at DESC LIMIT ?
+                )
+            ''', (cache_key, cache_key, max_variants))
+            cursor.execute('DELETE FROM llm_response_cache WHERE created_at < ?', (min_created_at,))
+            conn.commit()
+    except sqlite3.Error as e:
+        logging.error(f"Error storing cached response: {str(e)}")
+
+def encode_comment_cursor(created_at, comment_id):
+    """Encode a comment's (created_at, id) position as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps([created_at, comment_id]).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_comment_cursor(cursor):
+    """Decode a cursor from encode_comment_cursor; raises ValueError if it is malformed."""
+    try:
+        created_at, comment_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, ValueError, binascii.Error) as e:
+        raise ValueError(f"Invalid comments cursor: {cursor}") from e
+    if not isinstance(created_at, str) or not isinstance(comment_id, int):
+        raise ValueError(f"Invalid comments cursor: {cursor}")
+    return created_at, comment_id
+
+@timed_query
+def get_recipe_comments_page(recipe_id, limit, cursor=None):
+    """Fetch one page of a recipe's comments in (created_at, id) order.
+
+    Returns (comments, next_cursor); next_cursor is None on the last page.
+    Raises ValueError for a malformed cursor.
+    """
+    after = decode_comment_cursor(cursor) if cursor else None
+    try:
+        with get_db_connection() as conn:
+            db_cursor = conn.cursor()
+            if after:
+                db_cursor.execute('''
+                    SELECT id, comment, created_at FROM recipe_comments
+                    WHERE recipe_id = ? AND (created_at, id) > (?, ?)
+                    ORDER BY created_at, id
+                    LIMIT ?
+                ''', (recipe_id, after[0], after[1], limit + 1))
+            else:
+                db_cursor.execute('''
+                    SELECT id, comment, created_at FROM recipe_comments
+                    WHERE recipe_id = ?
+                    ORDER BY created_at, id
+                    LIMIT ?
+                ''', (recipe_id, limit + 1))
+            rows = db_cursor.fetchall()
     except sqlite3.Error as e:
-        logging.error(f"Error fetching recipe comments: {str(e)}")
-        return []
\ No newline at end of file
+        logging.error(f"Error fetching recipe comments page: {str(e)}")
+        return [], None
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_comment_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    comments = [{'comment': row['comment'], 'created_at': row['created_at']} for row in rows]
+    logging.debug(f"Fetched {len(comments)} comments for recipe_id {recipe_id}")
+    return comments, next_cursor
@@ -0,0 +1,36 @@
+# Gunicorn hooks; picked up automatically when gunicorn starts from this directory
+import os
+import tempfile
+
+# Workers write their metrics here so /metrics can sum them (see metrics.py);
+# set before the app is imported, default is private to this master process
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), f"chuckle-chow-metrics-{os.getpid()}"))
+
+def on_starting(server):
+    # Drop snapshots left by an earlier run that reused the directory
+    from metrics import clear_multiproc_dir
+    clear_multiproc_dir()
+
+def post_fork(server, worker):
+    # Fill the random recipe pool before this worker's first "Surprise Me" request,
+    # with its share of the refill budget so all workers together stay within it
+    from random_pool import random_pool
+    random_pool.share_budget(server.cfg.workers)
+    random_pool.start()
+
+def worker_exit(server, worker):
+    # Close pooled keep-alive connections to api.x.ai cleanly on worker shutdown
+    from xai_client import close_http_client
+    close_http_client()
+    # Write any ratings still buffered in write-behind mode
+    from database import flush_ratings
+    flush_ratings()
+    # Insert generated recipes still queued for write-back
+    from recipe_writeback import flush_writebacks
+    flush_writebacks()
+    # Keep this worker's final counts in the metrics directory
+    from metrics import write_snapshot
+    write_snapshot()
+    # Drain queued log records before the worker goes away
+    from log_config import stop_logging
+    stop_logging()
@@ -1,45 +1,18 @@
 import random
 import logging
 from constants import INGREDIENT_CATEGORIES
+from nutrition import compute_nutrition
 
-# Configure logging
-logging.basicConfig(
-    filename='recipe_generator.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - %(message)s - %(pathname)s:%(lineno)d'
-)
+# Every ingredient name the app knows about, built once at import
+ALL_VALID_INGREDIENTS = frozenset(item['name'] for items in INGREDIENT_CATEGORIES.values() for item in items)
 
 def validate_input(ingredients):
     """Validate input ingredients against known categories."""
-    valid_ingredients = []
-    all_valid_ingredients = {item['name'] for items in INGREDIENT_CATEGORIES.values() for item in items}
-    for ing in ingredients:
-        if ing in all_valid_ingredients:
-            valid_ingredients.append(ing)
-    return valid_ingredients
+    return [ing for ing in ingredients if ing in ALL_VALID_INGREDIENTS]
 
-def calculate_nutrition(ingredients):
-    """Calculate approximate nutrition based on ingredients."""
-    nutrition = {"calories": 0, "protein": 0, "fat": 0, "chaos_factor": len(ingredients)}
-    nutrition_data = {
-        "meat": {"calories": 250, "protein": 25, "fat": 15},
-        "vegetables": {"calories": 50, "protein": 2, "fat": 0},
-        "fruits": {"calories": 60, "protein": 1, "fat": 0},
-        "seafood": {"calories": 200, "protein": 20, "fat": 10},
-        "dairy": {"calories": 100, "protein": 5, "fat": 8},
-        "bread_carbs": {"calories": 150, "protein": 5, "fat": 2},
-        "devil_water": {"calories": 80, "protein": 0, "fat": 0}
-    }
-    for ing in ingredients:
-        for cat, items in INGREDIENT_CATEGORIES.items():
-            if ing in [item['name'] for item in items]:
-                data = nutrition_data.get(cat, {"calories": 100, "protein": 5, "fat": 5})
-                nutrition["calories"] += data["calories"]
-                nutrition["protein"] += data["protein"]
-                nutrition["fat"] += data["fat"]
-                break
-    nutrition["calories"] = max(100, nutrition["calories"])
-    return nutrition
+def calculate_nutrition(ingredients, quantities=None):
+    """Calculate approximate nutrition based on ingredients and optional per-ingredient servings."""
+    return compute_nutrition(ingredients, quantities)
 
 def generate_share_text(title, ingredients, steps, nutrition):
     """Generate a shareable text string for the recipe."""
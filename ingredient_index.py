@@ -0,0 +1,142 @@
+import logging
+import threading
+from array import array
+from bisect import bisect_left
+from database import get_recipe_catalog
+
+class IngredientIndex:
+    """Inverted ingredient -> recipe posting index over the recipe catalog.
+
+    Every ingredient name gets a dense integer id and a sorted array of the catalog
+    slots that use it, so "recipes containing all of these ingredients" only walks
+    the shortest posting lists instead of every recipe.
+    """
+
+    def __init__(self):
+        self.ingredient_ids = {}
+        self.postings = []
+        self.recipes = []
+        self.slots = {}
+        self.catalog = None
+
+    def add_recipe(self, recipe):
+        """Append a recipe to the index and its ingredients' posting lists."""
+        slot = len(self.recipes)
+        self.recipes.append(recipe)
+        self.slots[recipe.id] = slot
+        for name in {ing.name for ing in recipe.ingredients}:
+            ingredient_id = self.ingredient_ids.get(name)
+            if ingredient_id is None:
+                ingredient_id = len(self.postings)
+                self.ingredient_ids[name] = ingredient_id
+                self.postings.append(array('I'))
+            self.postings[ingredient_id].append(slot)
+
+    def _postings_for(self, ingredients):
+        """Return the posting lists for the ingredients, shortest first, or None if any is unknown."""
+        postings = []
+        for name in set(ingredients):
+            ingredient_id = self.ingredient_ids.get(name)
+            if ingredient_id is None:
+                return None
+            postings.append(self.postings[ingredient_id])
+        postings.sort(key=len)
+        return postings
+
+    def match_all(self, ingredients):
+        """Return the sorted catalog slots of recipes containing every ingredient."""
+        if not ingredients:
+            return array('I', range(len(self.recipes)))
+        postings = self._postings_for(ingredients)
+        if postings is None:
+            return array('I')
+        result = postings[0]
+        for other in postings[1:]:
+            result = _intersect(result, other)
+            if not result:
+                break
+        return result
+
+    def first_match(self, ingredients):
+        """Return the first catalog recipe containing every ingredient, or None."""
+        if not ingredients:
+            return self.recipes[0] if self.recipes else None
+        postings = self._postings_for(ingredients)
+        if postings is None:
+            return None
+        shortest, others = postings[0], postings[1:]
+        positions = [0] * len(others)
+        for slot in shortest:
+            for i, other in enumerate(others):
+                positions[i] = bisect_left(other, slot, positions[i])
+                if positions[i] == len(other):
+                    return None
+                if other[positions[i]] != slot:
+                    break
+            else:
+                return self.recipes[slot]
+        return None
+
+def _intersect(small, large):
+    """Intersect two sorted slot arrays, galloping through the larger one."""
+    result = array('I')
+    lo = 0
+    end = len(large)
+    for slot in small:
+        lo = bisect_left(large, slot, lo)
+        if lo == end:
+            break
+        if large[lo] == slot:
+            result.append(slot)
+    return result
+
+def build_index(recipes):
+    """Build a fresh IngredientIndex over a sequence of catalog recipes."""
+    index = IngredientIndex()
+    for recipe in recipes:
+        index.add_recipe(recipe)
+    index.catalog = recipes
+    return index
+
+def _can_extend(index, recipes):
+    """Check whether the catalog only differs from the index by appended recipes."""
+    seen = 0
+    for recipe in recipes:
+        slot = index.slots.get(recipe.id)
+        if slot is None:
+            continue
+        if slot != seen or index.recipes[slot].ingredients != recipe.ingredients:
+            return False
+        seen += 1
+    return seen == len(index.recipes)
+
+_index_lock = threading.Lock()
+_index = IngredientIndex()
+
+def get_ingredient_index():
+    """Return the ingredient index, synced incrementally with the current catalog."""
+    global _index
+    recipes = get_recipe_catalog()
+    index = _index
+    if index.catalog is recipes:
+        return index
+
+    with _index_lock:
+        index = _index
+        if index.catalog is recipes:
+            return index
+        if _can_extend(index, recipes):
+            added = 0
+            for recipe in recipes:
+                slot = index.slots.get(recipe.id)
+                if slot is None:
+                    index.add_recipe(recipe)
+                    added += 1
+                else:
+                    index.recipes[slot] = recipe
+            index.catalog = recipes
+            logging.debug(f"Extended ingredient index with {added} recipes")
+        else:
+            _index = index = build_index(recipes)
+            logging.debug(f"Rebuilt ingredient index over {len(recipes)} recipes")
+        return index
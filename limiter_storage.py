@@ -0,0 +1,152 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+from limits.storage import Storage
+from limits.storage.base import SlidingWindowCounterSupport, TimestampedSlidingWindow
+
+# Whether limits apply at all (off for load benchmarks), where flask-limiter keeps its
+# counters and which strategy it applies. The default sqlite:// storage is one file
+# shared by every worker on the host, so limits hold across gunicorn processes;
+# "memory://" restores per-process counters.
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "sqlite:///ratelimits.db")
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "fixed-window")
+RATE_LIMIT_BUSY_TIMEOUT_MS = int(os.getenv("RATE_LIMIT_BUSY_TIMEOUT_MS", "2000"))
+RATE_LIMIT_PRUNE_INTERVAL = 60
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """flask-limiter storage in a SQLite WAL file, shared by all processes on the host.
+
+    Fixed window counters are a single UPSERT ... RETURNING statement; sliding window
+    counters check and increment inside one BEGIN IMMEDIATE transaction. Counters are
+    disposable, so the file runs with synchronous=OFF and nothing waits on fsync.
+
+    URI forms: sqlite:///relative/path.db, sqlite:////absolute/path.db
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = (uri or RATE_LIMIT_STORAGE_URI)[len("sqlite://"):]
+        self.path = path[1:] if path.startswith("/") else path
+        self._local = threading.local()
+        self._last_prune = 0.0
+        self._connection().execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                expires_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=RATE_LIMIT_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute(f'PRAGMA busy_timeout={RATE_LIMIT_BUSY_TIMEOUT_MS}')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _prune(self, conn, now):
+        """Drop expired counters at most once per RATE_LIMIT_PRUNE_INTERVAL per process."""
+        if now - self._last_prune < RATE_LIMIT_PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        deleted = conn.execute('DELETE FROM rate_limits WHERE expires_at <= ?', (now,)).rowcount
+        if deleted:
+            logging.debug(f"Pruned {deleted} expired rate limit counters")
+
+    def _incr(self, conn, key, expiry, amount, now):
+        # A counter whose window has passed restarts at `amount` with a new expiry
+        return conn.execute('''
+            INSERT INTO rate_limits (key, count, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                count = CASE WHEN expires_at <= ? THEN excluded.count ELSE count + excluded.count END,
+                expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+            RETURNING count
+        ''', (key, amount, now + expiry, now, now)).fetchone()[0]
+
+    def incr(self, key, expiry, amount=1):
+        """Atomically add `amount` to a fixed window counter and return the new count."""
+        conn = self._connection()
+        now = time.time()
+        count = self._incr(conn, key, expiry, amount, now)
+        self._prune(conn, now)
+        return count
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT count FROM rate_limits WHERE key = ? AND expires_at > ?', (key, time.time())
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        now = time.time()
+        row = self._connection().execute(
+            'SELECT expires_at FROM rate_limits WHERE key = ? AND expires_at > ?', (key, now)
+        ).fetchone()
+        return row[0] if row else now
+
+    def check(self):
+        try:
+            self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self):
+        return self._connection().execute('DELETE FROM rate_limits').rowcount
+
+    def clear(self, key):
+        self._connection().execute('DELETE FROM rate_limits WHERE key = ?', (key,))
+
+    def _sliding_window(self, conn, key, expiry, now):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        counts = dict(conn.execute(
+            'SELECT key, count FROM rate_limits WHERE key IN (?, ?) AND expires_at > ?',
+            (previous_key, current_key, now)
+        ).fetchall())
+        previous_count = counts.get(previous_key, 0)
+        previous_ttl = (1 - (((now - expiry) / expiry) % 1)) * expiry if previous_count else 0.0
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, counts.get(current_key, 0), current_ttl
+
+    def acquire_sliding_window_entry(self, key, limit, expiry, amount=1):
+        """Count `amount` hits if the weighted two-window count stays within `limit`."""
+        if amount > limit:
+            return False
+        conn = self._connection()
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock first, so no other process can
+        # slip a hit in between the check and the increment
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(conn, key, expiry, now)
+            acquired = floor(previous_count * previous_ttl / expiry + current_count) + amount <= limit
+            if acquired:
+                # The current window's counter must outlive the next window, which weighs it
+                self._incr(conn, self.sliding_window_keys(key, expiry, now)[1], 2 * expiry, amount, now)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        self._prune(conn, now)
+        return acquired
+
+    def get_sliding_window(self, key, expiry):
+        return self._sliding_window(self._connection(), key, expiry, time.time())
+
+    def clear_sliding_window(self, key, expiry):
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self._connection().execute('DELETE FROM rate_limits WHERE key IN (?, ?)', (previous_key, current_key))
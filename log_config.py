@@ -0,0 +1,129 @@
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+
+# Logging configuration, all from the environment:
+#   LOG_LEVEL          minimum level (default DEBUG when DEBUG_MODE is true, else INFO)
+#   LOG_FILE           file to write to, empty to disable (default recipe_generator.log)
+#   LOG_CONSOLE        also write to stderr (default true)
+#   LOG_FORMAT         "kv" for key=value records or "text" for the classic format
+#   LOG_MAX_PAYLOAD    longest message kept before truncation, in characters
+#   LOG_SAMPLE_RATES   per-endpoint share of requests whose DEBUG/INFO records are kept,
+#                      e.g. "ingredients=0.01,generate_recipe=0.2,*=1.0"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if os.getenv("DEBUG_MODE", "false").lower() == "true" else "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "recipe_generator.log")
+LOG_CONSOLE = os.getenv("LOG_CONSOLE", "true").lower() == "true"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "kv")
+LOG_MAX_PAYLOAD = int(os.getenv("LOG_MAX_PAYLOAD", "500"))
+
+def _parse_sample_rates(value):
+    rates = {}
+    for item in value.split(","):
+        if "=" in item:
+            endpoint, rate = item.split("=", 1)
+            rates[endpoint.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+_endpoint = contextvars.ContextVar('log_endpoint', default='-')
+_sampled = contextvars.ContextVar('log_sampled', default=True)
+
+_listener = None
+_queue_handler = None
+
+def begin_request(endpoint):
+    """Tag log records from the current request and decide whether it is sampled."""
+    endpoint = endpoint or '-'
+    _endpoint.set(endpoint)
+    rate = LOG_SAMPLE_RATES.get(endpoint, LOG_SAMPLE_RATES.get('*', 1.0))
+    _sampled.set(rate >= 1.0 or random.random() < rate)
+
+class RequestContextFilter(logging.Filter):
+    """Attach the endpoint, drop unsampled DEBUG/INFO records and truncate long messages."""
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        record.endpoint = _endpoint.get()
+        message = record.getMessage()
+        if len(message) > LOG_MAX_PAYLOAD:
+            record.msg = f"{message[:LOG_MAX_PAYLOAD]}... [truncated {len(message) - LOG_MAX_PAYLOAD} chars]"
+            record.args = None
+        return True
+
+class KeyValueFormatter(logging.Formatter):
+    """Format records as key=value pairs with a quoted message."""
+
+    def format(self, record):
+        fields = [
+            f"ts={self.formatTime(record, '%Y-%m-%dT%H:%M:%S')}.{int(record.msecs):03d}",
+            f"level={record.levelname}",
+            f"logger={record.name}",
+            f"endpoint={getattr(record, 'endpoint', '-')}",
+            f"pid={record.process}",
+            f"src={record.filename}:{record.lineno}",
+            f"msg={json.dumps(record.getMessage(), ensure_ascii=False)}"
+        ]
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            fields.append(f"exc={json.dumps(record.exc_text, ensure_ascii=False)}")
+        return " ".join(fields)
+
+def _build_handlers():
+    if LOG_FORMAT == "kv":
+        formatter = KeyValueFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s - %(pathname)s:%(lineno)d')
+    handlers = []
+    if LOG_CONSOLE:
+        handlers.append(logging.StreamHandler(sys.stderr))
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def _start_listener():
+    """Route the root logger through a queue drained by a background listener thread."""
+    global _listener, _queue_handler
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    if _queue_handler is not None:
+        root.removeHandler(_queue_handler)
+    _queue_handler = logging.handlers.QueueHandler(log_queue)
+    _queue_handler.addFilter(RequestContextFilter())
+    root.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+    _listener.start()
+
+def configure_logging():
+    """Configure non-blocking logging for the process; safe to call more than once."""
+    if _listener is not None:
+        return
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    _start_listener()
+    os.register_at_fork(after_in_child=_restart_after_fork)
+    atexit.register(stop_logging)
+
+def _restart_after_fork():
+    """The listener thread does not survive a fork; start a fresh one in the child."""
+    if _listener is not None:
+        _start_listener()
+
+def stop_logging():
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,251 @@
+"""Prometheus metrics shared across worker processes.
+
+Each process records counters, gauges and histograms into plain dicts guarded by one
+short-held lock; nothing is shared between processes while recording. When
+METRICS_MULTIPROC_DIR is set, a background thread writes this process's values to
+<dir>/metrics-<pid>.json every METRICS_FLUSH_INTERVAL seconds (write + rename, so
+readers never see half a file), and /metrics sums the files of every worker,
+including ones that have exited, so counters never go backwards (gauges only
+count processes that are still running). Without the
+directory only the serving process's own metrics are exported.
+"""
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+_lock = threading.Lock()
+_registry = {}
+_flusher = None
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Counter:
+    """Monotonic counter with labels."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry[name] = self
+
+    def _key(self, labels):
+        return ','.join(f'{name}="{_escape(labels[name])}"' for name in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        _ensure_flusher()
+
+    def copy_values(self):
+        return dict(self.values)
+
+    def merge(self, total, values):
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, values):
+        for key, value in sorted(values.items()):
+            labels = f"{{{key}}}" if key else ''
+            yield f"{self.name}{labels} {_format(value)}"
+
+class Gauge(Counter):
+    """Current value with labels; the exported value is the sum over live workers."""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = value
+        _ensure_flusher()
+
+class Histogram(Counter):
+    """Fixed-bucket histogram with labels; each series is [bucket counts..., +Inf count, sum]."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+        _ensure_flusher()
+
+    def copy_values(self):
+        return {key: list(series) for key, series in self.values.items()}
+
+    def merge(self, total, values):
+        for key, series in values.items():
+            if len(series) != len(self.buckets) + 2:
+                continue
+            current = total.get(key)
+            total[key] = series if current is None else [a + b for a, b in zip(current, series)]
+
+    def render(self, values):
+        for key, series in sorted(values.items()):
+            prefix = key + ',' if key else ''
+            labels = f"{{{key}}}" if key else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                yield f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}'
+            yield f"{self.name}_sum{labels} {_format(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+http_request_seconds = Histogram(
+    'http_request_duration_seconds', 'Time to serve a request, including streamed bodies.',
+    ('route', 'method', 'status'))
+xai_request_seconds = Histogram(
+    'xai_request_duration_seconds', 'Latency of individual xAI API calls.', ('outcome',))
+xai_tokens = Histogram(
+    'xai_tokens_per_request', 'Tokens used per xAI completion, from the usage block.', ('type',),
+    buckets=TOKEN_BUCKETS)
+db_query_seconds = Histogram(
+    'db_query_duration_seconds', 'Time spent in database query functions.', ('query',), buckets=DB_BUCKETS)
+cache_requests = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result.', ('cache', 'result'))
+rate_limit_rejections = Counter(
+    'rate_limit_rejections_total', 'Requests rejected with 429 by the rate limiter.', ('route',))
+upstream_fallbacks = Counter(
+    'xai_fallbacks_total', 'Predefined recipes served because xAI was unavailable.')
+random_pool_depth = Gauge(
+    'random_pool_depth', 'Ready random recipes in the pool.', ('language',))
+random_pool_refill_seconds = Histogram(
+    'random_pool_refill_duration_seconds', 'Time to generate one recipe for the random pool.', ('language',))
+
+def timed_query(fn):
+    """Decorator recording a database function's duration in db_query_seconds."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            db_query_seconds.observe(time.perf_counter() - start, query=fn.__name__)
+    return wrapper
+
+def _snapshot():
+    with _lock:
+        return {name: metric.copy_values() for name, metric in _registry.items()}
+
+def write_snapshot():
+    """Write this process's metrics to its file in METRICS_MULTIPROC_DIR."""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    path = os.path.join(METRICS_MULTIPROC_DIR, f"metrics-{os.getpid()}.json")
+    try:
+        os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(_snapshot(), f)
+        os.replace(path + '.tmp', path)
+    except OSError as e:
+        logging.error(f"Error writing metrics snapshot {path}: {str(e)}")
+
+def _run_flusher():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        write_snapshot()
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None or not METRICS_MULTIPROC_DIR:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_run_flusher, name='metrics-flusher', daemon=True)
+            _flusher.start()
+
+def clear_multiproc_dir():
+    """Remove snapshot files left by a previous run; call once before workers start."""
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, 'metrics-*.json*')) if METRICS_MULTIPROC_DIR else ():
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.error(f"Error removing metrics snapshot {path}: {str(e)}")
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+def _collect():
+    """Return {name: values} summed over every worker's snapshot (or just this process)."""
+    if not METRICS_MULTIPROC_DIR:
+        return _snapshot()
+    write_snapshot()
+    totals = {name: {} for name in _registry}
+    for path in glob.glob(os.path.join(METRICS_MULTIPROC_DIR, 'metrics-*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Skipping unreadable metrics snapshot {path}: {str(e)}")
+            continue
+        running = _is_running(int(os.path.basename(path)[len('metrics-'):-len('.json')]))
+        for name, values in snapshot.items():
+            metric = _registry.get(name)
+            # An exited worker's gauges describe state that no longer exists
+            if metric is not None and (running or metric.kind != 'gauge'):
+                metric.merge(totals[name], values)
+    return totals
+
+def render_metrics():
+    """Render all metrics in the Prometheus text exposition format."""
+    values = _collect()
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        lines.extend(metric.render(values.get(name, {})))
+    return '\n'.join(lines) + '\n'
+
+def _reset_after_fork():
+    """Start a forked child from zero so the parent's values are not exported twice."""
+    global _lock, _flusher
+    _lock = threading.Lock()
+    _flusher = None
+    for metric in _registry.values():
+        metric.values = {}
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(write_snapshot)
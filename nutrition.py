@@ -0,0 +1,73 @@
+import logging
+import numpy as np
+from constants import INGREDIENT_CATEGORIES
+
+# Nutrients tracked per ingredient, in matrix column order
+NUTRIENTS = ('calories', 'protein', 'fat')
+
+# Per-serving defaults for each ingredient category; items in INGREDIENT_CATEGORIES
+# may override any nutrient with their own value
+CATEGORY_NUTRITION = {
+    "meat": {"calories": 250, "protein": 25, "fat": 15},
+    "vegetables": {"calories": 50, "protein": 2, "fat": 0},
+    "fruits": {"calories": 60, "protein": 1, "fat": 0},
+    "seafood": {"calories": 200, "protein": 20, "fat": 10},
+    "dairy": {"calories": 100, "protein": 5, "fat": 8},
+    "bread_carbs": {"calories": 150, "protein": 5, "fat": 2},
+    "devil_water": {"calories": 80, "protein": 0, "fat": 0}
+}
+DEFAULT_NUTRITION = {"calories": 100, "protein": 5, "fat": 5}
+MIN_CALORIES = 100
+
+def build_nutrient_table(categories):
+    """Return (row per ingredient name, nutrient matrix) with a trailing zero row for unknown names."""
+    rows = {}
+    values = []
+    for category, items in categories.items():
+        defaults = CATEGORY_NUTRITION.get(category, DEFAULT_NUTRITION)
+        for item in items:
+            # An ingredient listed under several categories counts as the first one
+            if item['name'] in rows:
+                continue
+            rows[item['name']] = len(values)
+            values.append([item.get(nutrient, defaults[nutrient]) for nutrient in NUTRIENTS])
+    values.append([0] * len(NUTRIENTS))
+    return rows, np.array(values, dtype=np.float64)
+
+INGREDIENT_ROWS, NUTRIENT_MATRIX = build_nutrient_table(INGREDIENT_CATEGORIES)
+UNKNOWN_ROW = len(INGREDIENT_ROWS)
+
+def _number(value):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 1)
+
+def compute_nutrition_batch(ingredient_lists, quantities=None):
+    """Compute nutrition for many ingredient lists in one vectorized pass.
+
+    `quantities` optionally gives a serving multiplier per ingredient, as a list
+    parallel to `ingredient_lists` (a None entry means one serving of each).
+    """
+    lengths = np.fromiter((len(ingredients) for ingredients in ingredient_lists), dtype=np.int64, count=len(ingredient_lists))
+    rows = np.fromiter((INGREDIENT_ROWS.get(ing, UNKNOWN_ROW) for ingredients in ingredient_lists for ing in ingredients),
+                       dtype=np.int64, count=int(lengths.sum()))
+    contributions = NUTRIENT_MATRIX[rows]
+    if quantities is not None:
+        weights = np.fromiter((qty for ingredients, qtys in zip(ingredient_lists, quantities)
+                               for qty in (qtys if qtys is not None else [1] * len(ingredients))),
+                              dtype=np.float64, count=len(rows))
+        contributions *= weights[:, None]
+
+    owners = np.repeat(np.arange(len(lengths)), lengths)
+    totals = np.column_stack([np.bincount(owners, weights=contributions[:, k], minlength=len(lengths))
+                              for k in range(len(NUTRIENTS))])
+    totals[:, 0] = np.maximum(totals[:, 0], MIN_CALORIES)
+    logging.debug(f"Computed nutrition for {len(lengths)} ingredient lists ({len(rows)} ingredients)")
+
+    return [
+        {**{nutrient: _number(value) for nutrient, value in zip(NUTRIENTS, row)}, "chaos_factor": int(length)}
+        for row, length in zip(totals.tolist(), lengths.tolist())
+    ]
+
+def compute_nutrition(ingredients, quantities=None):
+    """Compute nutrition for a single ingredient list."""
+    return compute_nutrition_batch([ingredients], None if quantities is None else [quantities])[0]
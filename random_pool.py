@@ -0,0 +1,144 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from metrics import cache_requests, random_pool_depth, random_pool_refill_seconds
+from recipe_generator import generate_random_recipe
+from single_flight import is_successful
+
+# Pool configuration: capacity per language, the depth that triggers a refill,
+# and the upstream budget refill workers may spend (split across gunicorn workers)
+RANDOM_POOL_ENABLED = os.getenv("RANDOM_POOL_ENABLED", "true").lower() == "true"
+RANDOM_POOL_SIZE = int(os.getenv("RANDOM_POOL_SIZE", "4"))
+RANDOM_POOL_LOW_WATER = int(os.getenv("RANDOM_POOL_LOW_WATER", "2"))
+RANDOM_POOL_REFILLS_PER_MINUTE = float(os.getenv("RANDOM_POOL_REFILLS_PER_MINUTE", "6"))
+RANDOM_POOL_LANGUAGES = [lang.strip() for lang in os.getenv("RANDOM_POOL_LANGUAGES", "english").split(",") if lang.strip()]
+
+class RandomRecipePool:
+    """Bounded per-language queues of ready random recipes, kept full by a background thread.
+
+    When a queue drops below the low-water mark the worker generates recipes until it
+    is full again, spending at most `refills_per_minute` upstream calls (token bucket).
+    """
+
+    def __init__(self, size=RANDOM_POOL_SIZE, low_water=RANDOM_POOL_LOW_WATER,
+                 refills_per_minute=RANDOM_POOL_REFILLS_PER_MINUTE, languages=RANDOM_POOL_LANGUAGES):
+        self.size = size
+        self.low_water = min(low_water, size)
+        self.refills_per_minute = refills_per_minute
+        self.refill_interval = 60.0 / refills_per_minute if refills_per_minute > 0 else None
+        self.languages = languages
+        self._queues = {language: deque(maxlen=size) for language in languages}
+        self._refilling = set(languages)
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._worker_pid = None
+        self._tokens = 1.0
+        self._tokens_at = time.monotonic()
+        self.counters = {'served': 0, 'fallbacks': 0, 'refills': 0, 'refill_failures': 0}
+        self.refill_latency = {'count': 0, 'total_seconds': 0.0, 'last_seconds': 0.0, 'max_seconds': 0.0}
+
+    def share_budget(self, workers):
+        """Give this process its share of the refill budget when `workers` processes each run a pool."""
+        if self.refills_per_minute > 0:
+            self.refill_interval = 60.0 * max(1, workers) / self.refills_per_minute
+
+    def start(self):
+        """Start the refill worker for this process if it is not already running."""
+        if self.refill_interval is None:
+            return
+        pid = os.getpid()
+        with self._lock:
+            if self._worker is not None and self._worker_pid == pid and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='random-recipe-pool', daemon=True)
+            self._worker_pid = pid
+            self._worker.start()
+            logging.debug(f"Started random recipe pool worker for pid {pid}")
+
+    def pop(self, language='english'):
+        """Return a ready random recipe, or None when the pool for the language is empty."""
+        if self.refill_interval is None:
+            return None
+        queue = self._queues.get(language)
+        if queue is None:
+            return None
+        self.start()
+        try:
+            recipe = queue.popleft()
+            self.counters['served'] += 1
+            cache_requests.inc(cache='random_pool', result='hit')
+        except IndexError:
+            recipe = None
+            self.counters['fallbacks'] += 1
+            cache_requests.inc(cache='random_pool', result='miss')
+        random_pool_depth.set(len(queue), language=language)
+        if len(queue) < self.low_water:
+            self._refilling.add(language)
+            self._wakeup.set()
+        return recipe
+
+    def _take_token(self):
+        """Spend one unit of refill budget; returns seconds to wait if none is available."""
+        now = time.monotonic()
+        self._tokens = min(1.0, self._tokens + (now - self._tokens_at) / self.refill_interval)
+        self._tokens_at = now
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            return 0.0
+        return (1.0 - self._tokens) * self.refill_interval
+
+    def _refill_one(self, language):
+        start = time.monotonic()
+        recipe = generate_random_recipe(language)
+        elapsed = time.monotonic() - start
+        # Predefined fallbacks served while xAI is down are not worth pooling
+        if not is_successful(recipe) or recipe.get('fallback'):
+            self.counters['refill_failures'] += 1
+            logging.warning(f"Random recipe pool refill failed for {language}: {recipe}")
+            return
+        self._queues[language].append(recipe)
+        random_pool_depth.set(len(self._queues[language]), language=language)
+        random_pool_refill_seconds.observe(elapsed, language=language)
+        self.counters['refills'] += 1
+        self.refill_latency['count'] += 1
+        self.refill_latency['total_seconds'] += elapsed
+        self.refill_latency['last_seconds'] = elapsed
+        self.refill_latency['max_seconds'] = max(self.refill_latency['max_seconds'], elapsed)
+        logging.debug(f"Refilled random recipe pool for {language} in {elapsed:.2f}s, depth {len(self._queues[language])}")
+
+    def _run(self):
+        while True:
+            for language in [lang for lang in self.languages if len(self._queues[lang]) >= self.size]:
+                self._refilling.discard(language)
+            if not self._refilling:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            wait = self._take_token()
+            if wait > 0:
+                time.sleep(wait)
+                continue
+            language = min(self._refilling, key=lambda lang: len(self._queues[lang]))
+            try:
+                self._refill_one(language)
+            except Exception as e:
+                self.counters['refill_failures'] += 1
+                logging.error(f"Error refilling random recipe pool: {str(e)}", exc_info=True)
+
+    def stats(self):
+        """Return pool depth per language, served/fallback counters and refill latency."""
+        latency = dict(self.refill_latency)
+        latency['avg_seconds'] = latency['total_seconds'] / latency['count'] if latency['count'] else 0.0
+        return {
+            'depth': {language: len(queue) for language, queue in self._queues.items()},
+            'capacity': self.size,
+            'low_water': self.low_water,
+            **self.counters,
+            'refill_latency': latency
+        }
+
+random_pool = RandomRecipePool(refills_per_minute=RANDOM_POOL_REFILLS_PER_MINUTE if RANDOM_POOL_ENABLED else 0)
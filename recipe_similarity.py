@@ -0,0 +1,114 @@
+"""IDF-weighted ingredient similarity between a request and the recipe catalog.
+
+The catalog is held as a sparse recipe x ingredient matrix in CSR form (indptr,
+indices and per-entry IDF weights as NumPy arrays) plus its CSC transpose, so
+rare ingredients like gator count for more than butter. Scoring a request only
+touches the columns of its ingredients: one bincount over their entries gives
+every recipe's weighted overlap, and the precomputed row weights turn that into
+weighted Jaccard or cosine scores for all recipes at once.
+"""
+import logging
+import os
+import threading
+import numpy as np
+from database import get_recipe_catalog
+
+# Score a partial match must reach to be served instead of generating a recipe
+# (set above 1 to only serve exact matches), and the scoring function used
+RECIPE_MATCH_THRESHOLD = float(os.getenv("RECIPE_MATCH_THRESHOLD", "0.4"))
+RECIPE_MATCH_METRIC = os.getenv("RECIPE_MATCH_METRIC", "jaccard")
+METRICS = ('jaccard', 'cosine')
+if RECIPE_MATCH_METRIC not in METRICS:
+    logging.warning(f"Unknown RECIPE_MATCH_METRIC {RECIPE_MATCH_METRIC!r}, using jaccard")
+    RECIPE_MATCH_METRIC = 'jaccard'
+
+class SimilarityIndex:
+    """Sparse IDF-weighted recipe x ingredient matrix over a catalog snapshot."""
+
+    def __init__(self, recipes):
+        self.recipes = recipes
+        self.ingredient_ids = {}
+        row_ids, col_ids = [], []
+        for slot, recipe in enumerate(recipes):
+            for name in sorted({ing.name for ing in recipe.ingredients}):
+                row_ids.append(slot)
+                col_ids.append(self.ingredient_ids.setdefault(name, len(self.ingredient_ids)))
+        rows = np.array(row_ids, dtype=np.int64)
+        cols = np.array(col_ids, dtype=np.int64)
+        n_recipes, n_ingredients = len(recipes), len(self.ingredient_ids)
+
+        # Smoothed IDF; an ingredient no recipe uses gets the highest weight
+        document_freq = np.bincount(cols, minlength=n_ingredients)
+        self.idf = np.log((1 + n_recipes) / (1 + document_freq)) + 1.0
+        self.unknown_idf = np.log(1 + n_recipes) + 1.0
+
+        # CSR rows (entries are already grouped by recipe) and the CSC transpose
+        self.indptr = np.concatenate(([0], np.cumsum(np.bincount(rows, minlength=n_recipes))))
+        self.indices = cols
+        self.data = self.idf[cols]
+        order = np.argsort(cols, kind='stable')
+        self.col_indptr = np.concatenate(([0], np.cumsum(document_freq)))
+        self.col_rows = rows[order]
+
+        self.row_weight = np.bincount(rows, weights=self.data, minlength=n_recipes)
+        self.row_norm = np.sqrt(np.bincount(rows, weights=self.data ** 2, minlength=n_recipes))
+
+    def scores(self, ingredients, metric=RECIPE_MATCH_METRIC):
+        """Return (slots, scores) for every recipe sharing at least one ingredient."""
+        names = sorted(set(ingredients))
+        cols = np.array([self.ingredient_ids[name] for name in names if name in self.ingredient_ids], dtype=np.int64)
+        unknown = len(names) - len(cols)
+        if not len(cols):
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Gather the recipe entries of the requested columns
+        starts = self.col_indptr[cols]
+        lengths = self.col_indptr[cols + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        weights = self.idf[cols]
+        if metric == 'cosine':
+            weights = weights ** 2
+        overlap = np.bincount(self.col_rows[offsets], weights=np.repeat(weights, lengths), minlength=len(self.recipes))
+
+        slots = np.flatnonzero(overlap)
+        overlap = overlap[slots]
+        if metric == 'cosine':
+            query_norm = np.sqrt((self.idf[cols] ** 2).sum() + unknown * self.unknown_idf ** 2)
+            return slots, overlap / (query_norm * self.row_norm[slots])
+        query_weight = self.idf[cols].sum() + unknown * self.unknown_idf
+        return slots, overlap / (query_weight + self.row_weight[slots] - overlap)
+
+    def top_k(self, ingredients, k=5, metric=RECIPE_MATCH_METRIC):
+        """Return up to k (recipe, score) pairs, best first (earliest recipe on ties)."""
+        slots, scores = self.scores(ingredients, metric)
+        # Scores equal up to float summation order must tie, so ties go to the earliest recipe
+        scores = np.round(scores, 12)
+        if len(slots) > k:
+            # Keep everything tied with the k-th best so ties resolve to the earliest recipe
+            keep = scores >= np.partition(scores, len(scores) - k)[len(scores) - k]
+            slots, scores = slots[keep], scores[keep]
+        order = np.lexsort((slots, -scores))[:k]
+        return [(self.recipes[slot], float(score)) for slot, score in zip(slots[order].tolist(), scores[order].tolist())]
+
+    def best_match(self, ingredients, threshold=RECIPE_MATCH_THRESHOLD, metric=RECIPE_MATCH_METRIC):
+        """Return the most similar (recipe, score) if it reaches the threshold, else None."""
+        matches = self.top_k(ingredients, 1, metric)
+        if not matches or matches[0][1] < threshold:
+            return None
+        return matches[0]
+
+_index_lock = threading.Lock()
+_index = None
+
+def get_similarity_index():
+    """Return the similarity index for the current catalog, rebuilding it when the catalog changes."""
+    global _index
+    recipes = get_recipe_catalog()
+    index = _index
+    if index is not None and index.recipes is recipes:
+        return index
+    with _index_lock:
+        if _index is None or _index.recipes is not recipes:
+            _index = SimilarityIndex(recipes)
+            logging.debug(f"Built similarity index over {len(recipes)} recipes and {len(_index.ingredient_ids)} ingredients")
+        return _index
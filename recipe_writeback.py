@@ -0,0 +1,195 @@
+"""Structured xAI recipes and their asynchronous write-back into the recipes table.
+
+With XAI_STRUCTURED_OUTPUT on, non-streaming generations ask xAI for JSON matching
+RECIPE_SCHEMA instead of free-form Markdown. Valid results are rendered with the
+predefined-recipe template and queued here; a background thread inserts them into
+recipes in batches, where the insert triggers fill recipe_ingredients and bump the
+catalog version, so every worker's matcher can serve them from then on.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from database import CatalogRecipe, Nutrition, RecipeIngredient, insert_generated_recipes
+
+XAI_STRUCTURED_OUTPUT = os.getenv("XAI_STRUCTURED_OUTPUT", "false").lower() == "true"
+RECIPE_WRITEBACK_ENABLED = os.getenv("RECIPE_WRITEBACK_ENABLED", "true").lower() == "true"
+RECIPE_WRITEBACK_INTERVAL = float(os.getenv("RECIPE_WRITEBACK_INTERVAL", "2"))
+RECIPE_WRITEBACK_QUEUE_SIZE = int(os.getenv("RECIPE_WRITEBACK_QUEUE_SIZE", "256"))
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+def _text(max_length):
+    return {"type": "string", "minLength": 1, "maxLength": max_length}
+
+def _integer(minimum, maximum):
+    return {"type": "integer", "minimum": minimum, "maximum": maximum}
+
+def _object(properties):
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+RECIPE_SCHEMA = _object({
+    "title_en": _text(200),
+    "title_es": _text(200),
+    "ingredients": {"type": "array", "minItems": 1, "maxItems": 30,
+                    "items": _object({"name": _text(80), "amount": _text(80)})},
+    "steps": {"type": "array", "minItems": 1, "maxItems": 40, "items": _text(1000)},
+    "nutrition": _object({
+        "calories": _integer(0, 10000),
+        "protein": _integer(0, 1000),
+        "fat": _integer(0, 1000),
+        "chaos_factor": _integer(1, 10)
+    }),
+    "cooking_time": _integer(1, 1440),
+    "difficulty": {"type": "string", "enum": list(DIFFICULTIES)},
+    "equipment": {"type": "array", "minItems": 1, "maxItems": 20, "items": _text(80)},
+    "servings": _integer(1, 100),
+    "tips": _text(1000)
+})
+
+STRUCTURED_INSTRUCTIONS = (
+    "Return the recipe as JSON matching the given schema: English and Spanish titles, ingredient names "
+    "(using the requested ingredient names exactly, lowercase) with measurements, steps, nutrition, "
+    "cooking time in minutes, difficulty, equipment, servings and one tip. No Markdown or emojis."
+)
+
+# Bounds are enforced by parse_structured_recipe; strict structured-output modes reject them
+LOCAL_ONLY_KEYWORDS = {"minLength", "maxLength", "minimum", "maximum", "minItems", "maxItems"}
+
+def _wire_schema(schema):
+    if isinstance(schema, dict):
+        return {key: _wire_schema(value) for key, value in schema.items() if key not in LOCAL_ONLY_KEYWORDS}
+    return schema
+
+def response_format():
+    """Return the xAI response_format requesting JSON that matches RECIPE_SCHEMA."""
+    return {"type": "json_schema", "json_schema": {"name": "recipe", "strict": True, "schema": _wire_schema(RECIPE_SCHEMA)}}
+
+def _check(value, schema, path):
+    """Validate a value against the subset of JSON Schema RECIPE_SCHEMA uses; returns it normalized."""
+    kind = schema.get("type")
+    if kind == "object":
+        if not isinstance(value, dict):
+            raise ValueError(f"{path} must be an object")
+        missing = [key for key in schema["required"] if key not in value]
+        if missing:
+            raise ValueError(f"{path} is missing {', '.join(missing)}")
+        return {key: _check(value[key], sub, f"{path}.{key}") for key, sub in schema["properties"].items()}
+    if kind == "array":
+        if not isinstance(value, list) or not schema["minItems"] <= len(value) <= schema["maxItems"]:
+            raise ValueError(f"{path} must be a list of {schema['minItems']}-{schema['maxItems']} items")
+        return [_check(item, schema["items"], f"{path}[{i}]") for i, item in enumerate(value)]
+    if kind == "integer":
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if isinstance(value, bool) or not isinstance(value, int) or not schema["minimum"] <= value <= schema["maximum"]:
+            raise ValueError(f"{path} must be an integer from {schema['minimum']} to {schema['maximum']}")
+        return value
+    if not isinstance(value, str):
+        raise ValueError(f"{path} must be a string")
+    value = value.strip()
+    if "enum" in schema:
+        value = value.lower()
+        if value not in schema["enum"]:
+            raise ValueError(f"{path} must be one of {', '.join(schema['enum'])}")
+    elif not schema["minLength"] <= len(value) <= schema["maxLength"]:
+        raise ValueError(f"{path} must be {schema['minLength']}-{schema['maxLength']} characters")
+    return value
+
+def parse_structured_recipe(text):
+    """Parse and validate a structured xAI completion; raises ValueError if it is unusable."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"recipe is not valid JSON: {str(e)}")
+    recipe = _check(data, RECIPE_SCHEMA, "recipe")
+    for ingredient in recipe["ingredients"]:
+        ingredient["name"] = ingredient["name"].lower()
+    return recipe
+
+def catalog_recipe(recipe):
+    """Build an unsaved CatalogRecipe from a parsed structured recipe, for rendering."""
+    return CatalogRecipe(
+        id=None,
+        title_en=recipe["title_en"],
+        title_es=recipe["title_es"],
+        ingredients=tuple(RecipeIngredient(ing["name"], ing["amount"]) for ing in recipe["ingredients"]),
+        steps=tuple(recipe["steps"]),
+        nutrition=Nutrition(**recipe["nutrition"]),
+        cooking_time=recipe["cooking_time"],
+        difficulty=recipe["difficulty"],
+        equipment=tuple(recipe["equipment"]),
+        servings=recipe["servings"],
+        tips=recipe["tips"]
+    )
+
+_queue = queue.Queue(maxsize=RECIPE_WRITEBACK_QUEUE_SIZE)
+_writer_lock = threading.Lock()
+_writer = None
+_writer_pid = None
+
+def queue_writeback(recipe, generation_key):
+    """Queue a parsed recipe for insertion into the catalog; never blocks the request."""
+    global _writer, _writer_pid
+    if not RECIPE_WRITEBACK_ENABLED:
+        return
+    row = {
+        **{key: recipe[key] for key in ('title_en', 'title_es', 'cooking_time', 'difficulty', 'servings', 'tips')},
+        **{key: json.dumps(recipe[key]) for key in ('ingredients', 'steps', 'nutrition', 'equipment')},
+        'generation_key': generation_key
+    }
+    try:
+        _queue.put_nowait(row)
+    except queue.Full:
+        logging.warning(f"Recipe write-back queue full, dropping generated recipe {recipe['title_en']!r}")
+        return
+    with _writer_lock:
+        if _writer is None or _writer_pid != os.getpid() or not _writer.is_alive():
+            _writer = threading.Thread(target=_run_writer, name='recipe-writeback', daemon=True)
+            _writer_pid = os.getpid()
+            _writer.start()
+
+def flush_writebacks(batch=None):
+    """Insert every queued recipe (after any already taken off the queue) in one transaction.
+
+    Returns the number of recipes inserted.
+    """
+    batch = list(batch or [])
+    while True:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return 0
+    try:
+        inserted = insert_generated_recipes(batch)
+        logging.info(f"Wrote back {inserted} of {len(batch)} generated recipes to the catalog")
+        return inserted
+    except Exception as e:
+        logging.error(f"Error writing back {len(batch)} generated recipes: {str(e)}")
+        return 0
+
+def _run_writer():
+    while True:
+        # Wait for work, then give concurrent generations a moment to join the batch
+        first = _queue.get()
+        time.sleep(RECIPE_WRITEBACK_INTERVAL)
+        try:
+            flush_writebacks([first])
+        except Exception as e:
+            logging.error(f"Error in recipe write-back thread: {str(e)}", exc_info=True)
+
+def _reset_after_fork():
+    """Give a forked child its own queue and writer; the parent still owns what it queued."""
+    global _queue, _writer_lock, _writer, _writer_pid
+    _queue = queue.Queue(maxsize=RECIPE_WRITEBACK_QUEUE_SIZE)
+    _writer_lock = threading.Lock()
+    _writer = None
+    _writer_pid = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush_writebacks)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from database import get_cached_responses, store_cached_response
+from metrics import cache_requests
+
+# Cache configuration
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_VARIANTS = int(os.getenv("LLM_CACHE_VARIANTS", "3"))
+# Chance that a lookup on a key with fewer than LLM_CACHE_VARIANTS responses misses to generate another
+LLM_CACHE_FILL_PROBABILITY = float(os.getenv("LLM_CACHE_FILL_PROBABILITY", "0.3"))
+
+def make_cache_key(ingredients, language, model, temperature):
+    """Build a cache key from the normalized generation request.
+
+    The randomly paired flavor ingredient is left out so every request for an
+    ingredient set shares one key; its stored variants supply the variety.
+    """
+    normalized = {
+        'ingredients': sorted({ing.strip().lower() for ing in ingredients}),
+        'language': language,
+        'model': model,
+        'temperature': round(temperature, 1)
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+def normalize_recipe_text(text):
+    """Normalize recipe text for hashing: Unicode NFC, case-folded, whitespace collapsed."""
+    return " ".join(unicodedata.normalize('NFC', text).casefold().split())
+
+def make_elucidation_key(recipe_text, language, model, temperature):
+    """Build a cache key from the content hash of the normalized recipe text."""
+    normalized = {
+        'kind': 'elucidation',
+        'text_sha256': hashlib.sha256(normalize_recipe_text(recipe_text).encode('utf-8')).hexdigest(),
+        'language': language,
+        'model': model,
+        'temperature': round(temperature, 1)
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()
+
+# TTLs of every cache sharing llm_response_cache; rows are only pruned once the
+# longest has passed, so a short-lived cache never deletes another's live entries
+_table_ttls = []
+
+class ResponseCache:
+    """Two-tier cache of LLM responses: an in-memory LRU in front of a SQLite table.
+
+    Each key holds up to `variants` responses and hits rotate through them. A key
+    is served as soon as it has one; until it has collected all of them, a lookup
+    misses with probability `fill_probability` so more variants get generated.
+    """
+
+    def __init__(self, max_entries=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL, variants=LLM_CACHE_VARIANTS, name='llm',
+                 fill_probability=LLM_CACHE_FILL_PROBABILITY):
+        self.name = name
+        self.fill_probability = fill_probability
+        self.max_entries = max_entries
+        self.ttl = ttl
+        _table_ttls.append(ttl)
+        self.variants = max(1, variants)
+        self._entries = OrderedDict()
+        self._rotation = {}
+        self._lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _remember(self, key, responses):
+        """Put (response, created_at) pairs into the memory tier, evicting the LRU key."""
+        self._entries[key] = responses
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._rotation.pop(evicted, None)
+
+    def _pick(self, key, responses):
+        """Rotate through the cached variants of a key."""
+        turn = self._rotation.get(key, 0)
+        self._rotation[key] = turn + 1
+        return responses[turn % len(responses)][0]
+
+    def get(self, key):
+        """Return a cached response for the key, or None if a new one should be generated."""
+        min_created_at = time.time() - self.ttl
+        fill = random.random() < self.fill_probability
+        with self._lock:
+            responses = [r for r in self._entries.get(key, ()) if r[1] >= min_created_at]
+            if len(responses) >= self.variants or (responses and not fill):
+                self._entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                cache_requests.inc(cache=self.name, result='memory_hit')
+                return self._pick(key, responses)
+
+        responses = get_cached_responses(key, min_created_at, self.variants)
+        with self._lock:
+            if responses:
+                self._remember(key, responses)
+            if len(responses) >= self.variants or (responses and not fill):
+                self.counters['disk_hits'] += 1
+                cache_requests.inc(cache=self.name, result='disk_hit')
+                return self._pick(key, responses)
+            self.counters['misses'] += 1
+        cache_requests.inc(cache=self.name, result='miss')
+        return None
+
+    def put(self, key, response):
+        """Store a freshly generated response in both tiers."""
+        now = time.time()
+        store_cached_response(key, response, now, self.variants, now - max(_table_ttls))
+        with self._lock:
+            responses = [(response, now)] + list(self._entries.get(key, ()))
+            self._remember(key, responses[:self.variants])
+            self.counters['stores'] += 1
+
+    def stats(self):
+        """Return hit/miss counters and the memory tier size."""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['memory_entries'] = len(self._entries)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
+
+response_cache = ResponseCache()
+# Elucidations of the same text are deterministic enough to reuse the first answer
+elucidation_cache = ResponseCache(variants=1, name='elucidation')
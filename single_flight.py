@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from response_cache import ResponseCache
+
+# How long a completed result answers retries of the same requestId, and how many stay in memory
+REQUEST_DEDUP_TTL = float(os.getenv("REQUEST_DEDUP_TTL", "300"))
+REQUEST_DEDUP_SIZE = int(os.getenv("REQUEST_DEDUP_SIZE", "2048"))
+
+def flight_keys(request_id, ingredients, is_random, preferences=None):
+    """Return the keys a generation request coalesces on: its requestId and, unless random, its normalized request."""
+    keys = [f"request:{request_id}"] if request_id else []
+    if not is_random:
+        normalized = {
+            'ingredients': sorted({str(ing).strip().lower() for ing in ingredients}),
+            'preferences': {'language': 'english', **(preferences or {})}
+        }
+        keys.append("ingredients:" + json.dumps(normalized, sort_keys=True))
+    return keys
+
+def is_successful(recipe):
+    """Check whether a generation result is worth replaying to retries."""
+    return bool(recipe) and 'text' in recipe and not recipe['text'].startswith("Failed to generate recipe")
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesce concurrent calls sharing any key into a single execution (thread version)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, keys, fn):
+        """Run fn() once for all concurrent callers that share one of the keys; returns (result, shared)."""
+        with self._lock:
+            call = next((self._calls[key] for key in keys if key in self._calls), None)
+            leader = call is None
+            if leader:
+                call = _Call()
+                for key in keys:
+                    self._calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                for key in keys:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+            call.done.set()
+
+class AsyncSingleFlight:
+    """Coalesce concurrent coroutines sharing any key into a single execution (asyncio version)."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, keys, coro_fn):
+        """Await coro_fn() once for all concurrent callers that share one of the keys; returns (result, shared)."""
+        future = next((self._calls[key] for key in keys if key in self._calls), None)
+        if future is not None:
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._calls[key] = future
+        try:
+            result = await coro_fn()
+            future.set_result(result)
+            return result, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            for key in keys:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+class CompletedResults:
+    """Finished results keyed by requestId.
+
+    Backed by a ResponseCache, so the SQLite tier shares results between workers and a
+    retry that lands on another worker is still replayed instead of calling xAI.
+    """
+
+    def __init__(self, ttl=REQUEST_DEDUP_TTL, max_entries=REQUEST_DEDUP_SIZE):
+        self._cache = ResponseCache(max_entries=max_entries, ttl=ttl, variants=1, name='request')
+
+    @staticmethod
+    def _key(request_id):
+        return hashlib.sha256(f"request:{request_id}".encode('utf-8')).hexdigest()
+
+    def get(self, request_id):
+        if not request_id:
+            return None
+        result = self._cache.get(self._key(request_id))
+        return json.loads(result) if result else None
+
+    def put(self, request_id, result):
+        if not request_id:
+            return
+        self._cache.put(self._key(request_id), json.dumps(result))
+
+def generate_once(request_id, ingredients, is_random, fn, preferences=None):
+    """Answer a generation request from the completed table or a shared in-flight call to fn()."""
+    recipe = completed_requests.get(request_id)
+    if recipe is not None:
+        logging.info(f"Replaying completed result for requestId {request_id}")
+        return recipe
+    recipe, shared = recipe_flights.do(flight_keys(request_id, ingredients, is_random, preferences), fn)
+    if shared:
+        logging.info(f"Coalesced requestId {request_id} onto an in-flight generation")
+    if is_successful(recipe):
+        completed_requests.put(request_id, recipe)
+    return recipe
+
+async def generate_once_async(request_id, ingredients, is_random, coro_fn, preferences=None):
+    """Async generate_once for the asyncio serving path."""
+    recipe = await asyncio.to_thread(completed_requests.get, request_id)
+    if recipe is not None:
+        logging.info(f"Replaying completed result for requestId {request_id}")
+        return recipe
+    recipe, shared = await async_recipe_flights.do(flight_keys(request_id, ingredients, is_random, preferences), coro_fn)
+    if shared:
+        logging.info(f"Coalesced requestId {request_id} onto an in-flight generation")
+    if is_successful(recipe):
+        await asyncio.to_thread(completed_requests.put, request_id, recipe)
+    return recipe
+
+recipe_flights = SingleFlight()
+async_recipe_flights = AsyncSingleFlight()
+completed_requests = CompletedResults()
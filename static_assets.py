@@ -0,0 +1,165 @@
+"""Static file serving for the built frontend in rg_new_app/dist.
+
+At startup every file under the dist directory is indexed with its content type,
+a content-hash ETag and, for compressible types, gzip and brotli variants (read
+from .gz/.br files next to it when present, otherwise compressed here and written
+back as those files). Representations up to STATIC_MEMORY_MAX_BYTES stay in
+memory; larger ones are sent from disk. Vite's content-hashed bundles under assets/ are cached for a
+year as immutable, index.html is always revalidated, and everything else is
+cached for STATIC_MAX_AGE seconds.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from flask import Response, request, send_file
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+STATIC_MEMORY_MAX_BYTES = int(os.getenv("STATIC_MEMORY_MAX_BYTES", str(256 * 1024)))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+STATIC_BROTLI_QUALITY = int(os.getenv("STATIC_BROTLI_QUALITY", "11"))
+STATIC_MIN_COMPRESS_BYTES = 512
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Vite names bundles like assets/index-BGLr5-Yp.js: an 8 character base64url hash
+HASHED_NAME = re.compile(r'^assets/.+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+COMPRESSIBLE_TYPES = {
+    'application/javascript', 'application/json', 'application/manifest+json', 'application/wasm',
+    'application/xml', 'image/svg+xml', 'image/vnd.microsoft.icon', 'image/x-icon'
+}
+SIDECAR_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# One representation of a file: its ETag, body (None when served from disk) and size
+Variant = namedtuple('Variant', ['etag', 'body', 'size'])
+StaticAsset = namedtuple('StaticAsset', ['path', 'content_type', 'cache_control', 'variants'])
+
+_assets = {}
+
+def _content_type(rel_path):
+    content_type = mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'
+    if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+        content_type += '; charset=utf-8'
+    return content_type
+
+def _cache_control(rel_path):
+    if rel_path == 'index.html':
+        # Names the current bundles, so it must never be served stale
+        return REVALIDATE_CACHE_CONTROL
+    if HASHED_NAME.match(rel_path):
+        return IMMUTABLE_CACHE_CONTROL
+    return f"public, max-age={STATIC_MAX_AGE}"
+
+def _is_compressible(content_type):
+    mime = content_type.split(';')[0]
+    return mime.startswith('text/') or mime in COMPRESSIBLE_TYPES
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _encoded(path, data, encoding):
+    """Return the encoded bytes, reusing an up-to-date sidecar file and writing one if missing.
+
+    Sidecars let later workers and restarts skip recompressing the same build.
+    """
+    sidecar = path + SIDECAR_SUFFIXES[encoding]
+    try:
+        if os.path.getmtime(sidecar) >= os.path.getmtime(path):
+            with open(sidecar, 'rb') as f:
+                return f.read()
+    except OSError:
+        pass
+    body = _compress(data, encoding)
+    try:
+        with open(f"{sidecar}.{os.getpid()}.tmp", 'wb') as f:
+            f.write(body)
+        os.replace(f"{sidecar}.{os.getpid()}.tmp", sidecar)
+    except OSError as e:
+        logging.debug(f"Could not write precompressed {sidecar}: {str(e)}")
+    return body
+
+def _index_file(path, rel_path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    content_type = _content_type(rel_path)
+    tag = hashlib.sha256(data).hexdigest()[:20]
+    in_memory = len(data) <= STATIC_MEMORY_MAX_BYTES
+    variants = {'identity': Variant(tag, data if in_memory else None, len(data))}
+    if _is_compressible(content_type) and len(data) >= STATIC_MIN_COMPRESS_BYTES:
+        encodings = ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+        for encoding in encodings:
+            body = _encoded(path, data, encoding)
+            # Not worth a Vary and a second cache entry for a marginal saving
+            if len(body) < len(data) * 0.9 and len(body) <= STATIC_MEMORY_MAX_BYTES:
+                variants[encoding] = Variant(f"{tag}-{SIDECAR_SUFFIXES[encoding][1:]}", body, len(body))
+    return StaticAsset(path, content_type, _cache_control(rel_path), variants)
+
+def load_static_assets(root):
+    """Index and precompress every file under root; replaces the previous index."""
+    global _assets
+    assets = {}
+    if not os.path.isdir(root):
+        logging.warning(f"Static directory {root} not found; no frontend files will be served")
+    for directory, _, files in os.walk(root):
+        for name in files:
+            path = os.path.join(directory, name)
+            rel_path = os.path.relpath(path, root).replace(os.sep, '/')
+            if name.endswith('.tmp') or (os.path.splitext(name)[1] in ('.br', '.gz') and os.path.exists(os.path.splitext(path)[0])):
+                continue
+            try:
+                assets[rel_path] = _index_file(path, rel_path)
+            except OSError as e:
+                logging.error(f"Error indexing static file {rel_path}: {str(e)}")
+    _assets = assets
+    in_memory = sum(v.size for asset in assets.values() for v in asset.variants.values() if v.body is not None)
+    compressed = sum(1 for asset in assets.values() if len(asset.variants) > 1)
+    logging.info(f"Indexed {len(assets)} static files from {root} ({compressed} precompressed, "
+                 f"{in_memory // 1024} KiB in memory, brotli={BROTLI_AVAILABLE})")
+    return assets
+
+def has_static_asset(rel_path):
+    return rel_path in _assets
+
+def _negotiate(variants):
+    """Pick the best encoding the client accepts, preferring brotli on equal quality."""
+    best, best_quality = 'identity', 0
+    for encoding in ('br', 'gzip'):
+        if encoding in variants:
+            quality = request.accept_encodings.quality(encoding)
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+    return best
+
+def send_static_asset(rel_path):
+    """Return the response for an indexed file, or None if it is not in the index."""
+    asset = _assets.get(rel_path)
+    if asset is None:
+        return None
+    encoding = _negotiate(asset.variants)
+    variant = asset.variants[encoding]
+
+    if any(request.if_none_match.contains_weak(v.etag) for v in asset.variants.values()):
+        response = Response(status=304)
+    elif variant.body is None:
+        # Large files stream from disk, with Range support
+        response = send_file(asset.path, mimetype=asset.content_type.split(';')[0], conditional=True, etag=False, max_age=None)
+    else:
+        response = Response(variant.body, content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(variant.etag)
+    response.headers['Cache-Control'] = asset.cache_control
+    if len(asset.variants) > 1:
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep imports from starting background metric writers or touching shared state
+os.environ.setdefault("METRICS_MULTIPROC_DIR", "")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("RANDOM_POOL_ENABLED", "false")
+os.environ.setdefault("LOG_FILE", "")
+
+import database
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A freshly initialized, seeded database in a temporary directory."""
+    database.close_db_connection()
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'recipes.db'))
+    monkeypatch.setattr(database, '_catalog_cache', (None, ()))
+    database.init_db()
+    yield database
+    database.close_db_connection()
+
+def insert_recipe(title, ingredient_names, **columns):
+    """Insert a recipe through plain SQL, the way any writer would; returns its id."""
+    row = {
+        'title_en': title,
+        'title_es': columns.pop('title_es', None),
+        'ingredients': json.dumps([{'name': name, 'amount': '1 cup'} for name in ingredient_names]),
+        'steps': json.dumps(['Cook it.']),
+        'nutrition': json.dumps({'calories': 100, 'protein': 5, 'fat': 2, 'chaos_factor': 3}),
+        'cooking_time': 10,
+        'difficulty': 'easy',
+        'equipment': json.dumps(['pot']),
+        'servings': 2,
+        'tips': 'Taste it.',
+        **columns
+    }
+    with database.get_db_connection() as conn:
+        cursor = conn.execute(
+            f"INSERT INTO recipes ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})", tuple(row.values()))
+        conn.commit()
+        return cursor.lastrowid
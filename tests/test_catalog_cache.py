@@ -0,0 +1,51 @@
+import json
+
+from conftest import insert_recipe
+
+def test_catalog_is_reused_while_version_is_unchanged(db):
+    first = db.get_recipe_catalog()
+    assert first
+    assert db.get_recipe_catalog() is first
+
+def test_insert_bumps_version_and_reloads_catalog(db):
+    before = db.get_recipe_catalog()
+    version = db.get_table_version('recipes')
+    recipe_id = insert_recipe('Gator Bites', ['gator', 'hot sauce'])
+    assert db.get_table_version('recipes') == version + 1
+    after = db.get_recipe_catalog()
+    assert after is not before
+    assert after[-1].id == recipe_id
+    assert [ing.name for ing in after[-1].ingredients] == ['gator', 'hot sauce']
+
+def test_catalog_column_update_invalidates(db):
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    before = db.get_recipe_catalog()
+    with db.get_db_connection() as conn:
+        conn.execute('UPDATE recipes SET title_en = ? WHERE id = ?', ('Okra Gumbo', recipe_id))
+        conn.commit()
+    after = db.get_recipe_catalog()
+    assert after is not before
+    assert next(r for r in after if r.id == recipe_id).title_en == 'Okra Gumbo'
+
+def test_rating_update_keeps_cached_catalog(db):
+    before = db.get_recipe_catalog()
+    version = db.get_table_version('recipes')
+    db.update_recipe_rating(before[0].id, 5, None)
+    assert db.get_table_version('recipes') == version
+    assert db.get_recipe_catalog() is before
+
+def test_delete_invalidates(db):
+    recipe_id = insert_recipe('Doomed Dish', ['grits'])
+    assert recipe_id in {r.id for r in db.get_recipe_catalog()}
+    with db.get_db_connection() as conn:
+        conn.execute('DELETE FROM recipes WHERE id = ?', (recipe_id,))
+        conn.commit()
+    assert recipe_id not in {r.id for r in db.get_recipe_catalog()}
+
+def test_flavor_pairs_writes_bump_their_version(db):
+    version = db.get_table_version('flavor_pairs')
+    with db.get_db_connection() as conn:
+        conn.execute('INSERT INTO flavor_pairs (ingredient, pairs) VALUES (?, ?)', ('gator', json.dumps(['lemon'])))
+        conn.commit()
+    assert db.get_table_version('flavor_pairs') == version + 1
+    assert db.get_flavor_pairs()['gator'] == ['lemon']
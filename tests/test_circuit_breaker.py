@@ -0,0 +1,90 @@
+import httpx
+import pytest
+
+import xai_client
+from xai_client import CircuitBreaker
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(xai_client, 'time', clock)
+    return clock
+
+def status_error(code):
+    request = httpx.Request('POST', 'https://api.x.ai/v1/chat/completions')
+    return httpx.HTTPStatusError('upstream', request=request, response=httpx.Response(code, request=request))
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == 'closed'
+    breaker.record(False)
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.counters == {'opened': 1, 'rejected': 1}
+
+def test_half_open_probe_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    # Only the one probe goes through until it reports back
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+def test_half_open_probe_reopens_on_failure(clock):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30)
+    for _ in range(5):
+        breaker.record(False)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == 'open'
+    assert breaker.counters['opened'] == 2
+    assert not breaker.allow()
+
+def test_lost_probe_is_replaced_after_reset_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record(False)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 30
+    assert breaker.allow()
+
+def test_record_call_counts_slow_and_retryable_calls_as_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30, slow_call_seconds=10)
+    breaker.record_call(2.0)
+    assert breaker.state == 'closed'
+    breaker.record_call(1.0, status_error(400))
+    assert breaker.state == 'closed'
+    breaker.record_call(12.0)
+    assert breaker.state == 'open'
+
+@pytest.mark.parametrize('error, retryable', [
+    (status_error(429), True),
+    (status_error(503), True),
+    (status_error(404), False),
+    (httpx.ConnectTimeout('timed out'), True),
+    (ValueError('bad json'), False),
+])
+def test_retryable_errors(error, retryable):
+    assert xai_client.is_retryable(error) is retryable
+    breaker = CircuitBreaker(failure_threshold=1)
+    breaker.record_call(0.1, error)
+    assert (breaker.state == 'open') is retryable
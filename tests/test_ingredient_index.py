@@ -0,0 +1,69 @@
+import random
+
+import ingredient_index
+from conftest import insert_recipe
+from database import CatalogRecipe, Nutrition, RecipeIngredient
+from ingredient_index import build_index, get_ingredient_index
+
+VOCABULARY = [f"ingredient-{i}" for i in range(40)]
+
+def catalog(size, seed=7):
+    rng = random.Random(seed)
+    return tuple(
+        CatalogRecipe(
+            id=recipe_id, title_en=f"Recipe {recipe_id}", title_es=None,
+            ingredients=tuple(RecipeIngredient(name, '1 cup') for name in sorted(set(rng.sample(VOCABULARY, rng.randint(2, 6))))),
+            steps=('Cook it.',), nutrition=Nutrition(), cooking_time=10,
+            difficulty='easy', equipment=('pot',), servings=2, tips=''
+        )
+        for recipe_id in range(1, size + 1)
+    )
+
+def linear_match(recipes, ingredients):
+    """The pre-index matcher: score every recipe, keep the best full match."""
+    scored = [(recipe, len(set(ingredients) & {ing.name for ing in recipe.ingredients})) for recipe in recipes]
+    best_recipe, best_score = max(scored, key=lambda x: x[1])
+    return best_recipe if best_score >= len(set(ingredients)) else None
+
+def test_first_match_agrees_with_linear_scan():
+    recipes = catalog(500)
+    index = build_index(recipes)
+    rng = random.Random(11)
+    for _ in range(300):
+        query = rng.sample(VOCABULARY, rng.randint(1, 3))
+        assert index.first_match(query) == linear_match(recipes, query), query
+
+def test_unknown_ingredient_and_duplicates():
+    recipes = catalog(50)
+    index = build_index(recipes)
+    assert index.first_match(['not-an-ingredient']) is None
+    name = recipes[3].ingredients[0].name
+    assert index.first_match([name, name]) == index.first_match([name])
+
+def test_match_all_returns_every_matching_slot():
+    recipes = catalog(200)
+    index = build_index(recipes)
+    query = [recipes[0].ingredients[0].name]
+    expected = [slot for slot, recipe in enumerate(recipes) if query[0] in {ing.name for ing in recipe.ingredients}]
+    assert list(index.match_all(query)) == expected
+
+def test_appended_recipes_extend_the_index_in_place(db, monkeypatch):
+    monkeypatch.setattr(ingredient_index, '_index', ingredient_index.IngredientIndex())
+    index = get_ingredient_index()
+    recipe_id = insert_recipe('Gator Tail Tacos', ['gator tail', 'tortillas'])
+    extended = get_ingredient_index()
+    assert extended is index
+    assert extended.first_match(['gator tail', 'tortillas']).id == recipe_id
+    assert extended.first_match(['gator tail']) == linear_match(extended.catalog, ['gator tail'])
+
+def test_changed_ingredients_rebuild_the_index(db, monkeypatch):
+    monkeypatch.setattr(ingredient_index, '_index', ingredient_index.IngredientIndex())
+    recipe_id = insert_recipe('Possum Pie', ['possum'])
+    index = get_ingredient_index()
+    with db.get_db_connection() as conn:
+        conn.execute('UPDATE recipes SET ingredients = ? WHERE id = ?', ('[{"name": "pecans", "amount": "1 cup"}]', recipe_id))
+        conn.commit()
+    rebuilt = get_ingredient_index()
+    assert rebuilt is not index
+    assert rebuilt.first_match(['possum']) is None
+    assert rebuilt.first_match(['pecans']).id == recipe_id
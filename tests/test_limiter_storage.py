@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+from limits import parse
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter
+
+import limiter_storage
+from limiter_storage import SQLiteStorage
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(limiter_storage, 'time', clock)
+    return clock
+
+@pytest.fixture
+def uri(tmp_path):
+    return f"sqlite:///{tmp_path / 'ratelimits.db'}"
+
+def test_fixed_window_counts_and_resets(uri, clock):
+    limiter = FixedWindowRateLimiter(SQLiteStorage(uri))
+    limit = parse("3 per 10 seconds")
+    assert [limiter.hit(limit, '1.2.3.4', 'generate') for _ in range(4)] == [True, True, True, False]
+    assert limiter.hit(limit, '5.6.7.8', 'generate')
+    clock.now += 9.9
+    assert not limiter.hit(limit, '1.2.3.4', 'generate')
+    clock.now += 0.2
+    assert limiter.hit(limit, '1.2.3.4', 'generate')
+
+def test_fixed_window_is_shared_between_storages(uri, clock):
+    # Two storages on one file stand in for two gunicorn workers
+    first, second = FixedWindowRateLimiter(SQLiteStorage(uri)), FixedWindowRateLimiter(SQLiteStorage(uri))
+    limit = parse("2 per minute")
+    assert first.hit(limit, 'client')
+    assert second.hit(limit, 'client')
+    assert not first.hit(limit, 'client')
+    assert not second.hit(limit, 'client')
+
+def test_fixed_window_counts_concurrent_hits_exactly(uri):
+    storage = SQLiteStorage(uri)
+    threads = [threading.Thread(target=lambda: [storage.incr('key', 60) for _ in range(50)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert storage.get('key') == 400
+
+def test_sliding_window_weighs_the_previous_window(uri, clock):
+    limiter = SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    limit = parse("10 per 10 seconds")
+    assert sum(limiter.hit(limit, 'client') for _ in range(12)) == 10
+    # Halfway through the next window the previous one still counts for half
+    clock.now += 15
+    assert sum(limiter.hit(limit, 'client') for _ in range(10)) == 5
+    # Two windows later nothing carries over
+    clock.now += 20
+    assert sum(limiter.hit(limit, 'client') for _ in range(12)) == 10
+
+def test_sliding_window_is_shared_between_storages(uri, clock):
+    first, second = SlidingWindowCounterRateLimiter(SQLiteStorage(uri)), SlidingWindowCounterRateLimiter(SQLiteStorage(uri))
+    limit = parse("4 per minute")
+    assert sum(limiter.hit(limit, 'client') for limiter in (first, second) * 3) == 4
+
+def test_expired_counters_are_pruned(uri, clock):
+    storage = SQLiteStorage(uri)
+    storage.incr('old', 10)
+    clock.now += limiter_storage.RATE_LIMIT_PRUNE_INTERVAL + 1
+    storage.incr('new', 10)
+    keys = [row[0] for row in storage._connection().execute('SELECT key FROM rate_limits')]
+    assert keys == ['new']
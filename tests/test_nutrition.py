@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+# The ingredient catalog lives in constants.py, which deployments supply alongside the app
+constants = pytest.importorskip('constants')
+from nutrition import CATEGORY_NUTRITION, DEFAULT_NUTRITION, compute_nutrition, compute_nutrition_batch
+
+def loop_nutrition(ingredients):
+    """The per-recipe loop compute_nutrition_batch replaced."""
+    nutrition = {"calories": 0, "protein": 0, "fat": 0, "chaos_factor": len(ingredients)}
+    for ing in ingredients:
+        for cat, items in constants.INGREDIENT_CATEGORIES.items():
+            if ing in [item['name'] for item in items]:
+                data = CATEGORY_NUTRITION.get(cat, DEFAULT_NUTRITION)
+                nutrition["calories"] += data["calories"]
+                nutrition["protein"] += data["protein"]
+                nutrition["fat"] += data["fat"]
+                break
+    nutrition["calories"] = max(100, nutrition["calories"])
+    return nutrition
+
+NAMES = sorted({item['name'] for items in constants.INGREDIENT_CATEGORIES.values() for item in items
+                if not any(nutrient in item for nutrient in ('calories', 'protein', 'fat'))})
+
+def random_lists(count, seed=5):
+    rng = random.Random(seed)
+    return [rng.choices(NAMES + ['not-an-ingredient'], k=rng.randint(0, 8)) for _ in range(count)]
+
+def test_batch_matches_the_per_recipe_loop():
+    lists = random_lists(500)
+    assert compute_nutrition_batch(lists) == [loop_nutrition(ingredients) for ingredients in lists]
+
+def test_single_list_matches_the_batch():
+    lists = random_lists(20, seed=9)
+    assert [compute_nutrition(ingredients) for ingredients in lists] == compute_nutrition_batch(lists)
+
+def test_empty_inputs():
+    assert compute_nutrition_batch([]) == []
+    assert compute_nutrition([]) == {"calories": 100, "protein": 0, "fat": 0, "chaos_factor": 0}
+
+def test_quantities_scale_each_ingredient():
+    ingredients = random_lists(1, seed=3)[0] or [NAMES[0]]
+    one = compute_nutrition_batch([[ing] for ing in ingredients])
+    scaled = compute_nutrition(ingredients, [2] * len(ingredients))
+    assert scaled['protein'] == sum(2 * n['protein'] for n in one)
+    assert compute_nutrition_batch([ingredients, ingredients], [None, [1] * len(ingredients)])[0] == compute_nutrition(ingredients)
@@ -0,0 +1,59 @@
+import pytest
+
+import database
+from conftest import insert_recipe
+
+@pytest.fixture(params=[False, True], ids=['sync', 'write-behind'])
+def rate(request, db, monkeypatch):
+    """Rate through update_recipe_rating in sync or write-behind mode, flushing after each call."""
+    monkeypatch.setattr(database, 'RATING_WRITE_BEHIND', request.param)
+    # Keep the background flusher asleep; the test flushes explicitly
+    monkeypatch.setattr(database, 'RATING_FLUSH_INTERVAL', 3600)
+
+    def rate(recipe_id, rating, comment=None, idempotency_key=None):
+        database.update_recipe_rating(recipe_id, rating, comment, idempotency_key)
+        database.flush_ratings()
+    return rate
+
+def aggregates(recipe_id):
+    with database.get_db_connection() as conn:
+        row = conn.execute('SELECT rating, rating_sum, rating_count FROM recipes WHERE id = ?', (recipe_id,)).fetchone()
+        comments = conn.execute('SELECT COUNT(*) FROM recipe_comments WHERE recipe_id = ?', (recipe_id,)).fetchone()[0]
+    return row['rating'], row['rating_sum'], row['rating_count'], comments
+
+def test_ratings_accumulate(rate):
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    rate(recipe_id, 5, 'Great')
+    rate(recipe_id, 2)
+    assert aggregates(recipe_id) == (3.5, 7, 2, 1)
+
+def test_retried_key_is_applied_once(rate):
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    for _ in range(3):
+        rate(recipe_id, 4, 'Tasty', idempotency_key='retry-1')
+    rate(recipe_id, 2, idempotency_key='retry-2')
+    assert aggregates(recipe_id) == (3.0, 6, 2, 1)
+
+def test_buffered_retries_are_dropped_before_flush(db, monkeypatch):
+    monkeypatch.setattr(database, 'RATING_WRITE_BEHIND', True)
+    monkeypatch.setattr(database, 'RATING_FLUSH_INTERVAL', 3600)
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    for _ in range(3):
+        database.update_recipe_rating(recipe_id, 4, None, 'retry-1')
+    assert database.flush_ratings() == 1
+    assert aggregates(recipe_id)[2] == 1
+
+def test_unknown_recipe_is_rejected(rate):
+    with pytest.raises(ValueError):
+        rate(999999, 5, idempotency_key='missing')
+
+def test_missing_recipe_in_batch_releases_its_key(db):
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        with pytest.raises(ValueError):
+            database._apply_rating(cursor, 999999, 5, None, 'shared-key')
+        conn.commit()
+        assert database._apply_rating(cursor, recipe_id, 5, None, 'shared-key') is True
+        conn.commit()
+    assert aggregates(recipe_id)[2] == 1
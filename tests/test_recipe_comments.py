@@ -0,0 +1,59 @@
+import importlib
+
+import pytest
+
+from conftest import insert_recipe
+
+@pytest.fixture
+def client(db):
+    # app initializes the database at import, so import it once DB_PATH points at the test database
+    app = importlib.import_module('app')
+    return app.app.test_client()
+
+def add_comments(db, recipe_id, count, created_at='2024-01-01 00:00:00'):
+    with db.get_db_connection() as conn:
+        conn.executemany('INSERT INTO recipe_comments (recipe_id, comment, created_at) VALUES (?, ?, ?)',
+                         [(recipe_id, f"comment {i}", created_at) for i in range(count)])
+        conn.commit()
+
+def test_pages_follow_the_cursor_to_the_end(db, client):
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    # Identical timestamps make the id the only tie-breaker
+    add_comments(db, recipe_id, 7)
+    seen, cursor, pages = [], None, 0
+    while True:
+        query = {'recipe_id': recipe_id, 'limit': 3, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/recipe_comments', query_string=query)
+        assert response.status_code == 200
+        seen += [c['comment'] for c in response.get_json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            assert 'Link' not in response.headers
+            break
+        assert 'rel="next"' in response.headers['Link']
+    assert pages == 3
+    assert seen == [f"comment {i}" for i in range(7)]
+
+def test_limit_defaults_and_is_capped(db, client, monkeypatch):
+    app = importlib.import_module('app')
+    monkeypatch.setattr(app, 'COMMENTS_PAGE_SIZE', 2)
+    monkeypatch.setattr(app, 'COMMENTS_MAX_PAGE_SIZE', 4)
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    add_comments(db, recipe_id, 6)
+    assert len(client.get('/recipe_comments', query_string={'recipe_id': recipe_id}).get_json()) == 2
+    assert len(client.get('/recipe_comments', query_string={'recipe_id': recipe_id, 'limit': 100}).get_json()) == 4
+
+@pytest.mark.parametrize('cursor', ['not-base64!', 'bm90LWpzb24', 'WzEsICJ4Il0'])
+def test_bad_cursor_is_rejected(db, client, cursor):
+    recipe_id = insert_recipe('Okra Stew', ['okra'])
+    response = client.get('/recipe_comments', query_string={'recipe_id': recipe_id, 'cursor': cursor})
+    assert response.status_code == 400
+
+@pytest.mark.parametrize('limit', ['0', '-5', 'ten'])
+def test_bad_limit_is_rejected(db, client, limit):
+    response = client.get('/recipe_comments', query_string={'recipe_id': 1, 'limit': limit})
+    assert response.status_code == 400
+
+def test_missing_recipe_id_is_rejected(client):
+    assert client.get('/recipe_comments').status_code == 400
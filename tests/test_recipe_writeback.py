@@ -0,0 +1,82 @@
+import copy
+import json
+
+import pytest
+
+import recipe_writeback
+from recipe_writeback import catalog_recipe, flush_writebacks, parse_structured_recipe, queue_writeback
+
+VALID = {
+    "title_en": "  Gator Gumbo ",
+    "title_es": "Gumbo de Caimán",
+    "ingredients": [{"name": "Gator", "amount": "1 lb"}, {"name": "okra", "amount": "2 cups"}],
+    "steps": ["Brown the gator.", "Simmer with okra."],
+    "nutrition": {"calories": 450.0, "protein": 40, "fat": 12, "chaos_factor": 7},
+    "cooking_time": 90,
+    "difficulty": "Medium",
+    "equipment": ["dutch oven"],
+    "servings": 4,
+    "tips": "Serve over rice."
+}
+
+def variant(path, value):
+    """Return VALID as JSON with the value at `path` replaced, or removed when value is Ellipsis."""
+    data = copy.deepcopy(VALID)
+    *parents, last = path
+    target = data
+    for key in parents:
+        target = target[key]
+    if value is ...:
+        del target[last]
+    else:
+        target[last] = value
+    return json.dumps(data)
+
+def test_valid_recipe_is_normalized():
+    recipe = parse_structured_recipe(json.dumps(VALID))
+    assert recipe["title_en"] == "Gator Gumbo"
+    assert recipe["difficulty"] == "medium"
+    assert recipe["nutrition"]["calories"] == 450 and isinstance(recipe["nutrition"]["calories"], int)
+    assert [ing["name"] for ing in recipe["ingredients"]] == ["gator", "okra"]
+    assert catalog_recipe(recipe).ingredients[0].amount == "1 lb"
+
+def test_unknown_keys_are_dropped():
+    recipe = parse_structured_recipe(json.dumps({**VALID, "wine_pairing": "moonshine"}))
+    assert "wine_pairing" not in recipe
+
+@pytest.mark.parametrize('text', [
+    'not json',
+    '[]',
+    variant(("title_es",), ...),
+    variant(("title_en",), "   "),
+    variant(("title_en",), "x" * 201),
+    variant(("ingredients",), []),
+    variant(("ingredients", 0, "amount"), ...),
+    variant(("steps",), "Cook it."),
+    variant(("steps", 0), 3),
+    variant(("nutrition", "chaos_factor"), 11),
+    variant(("nutrition", "fat"), 2.5),
+    variant(("cooking_time",), True),
+    variant(("cooking_time",), "90"),
+    variant(("difficulty",), "impossible"),
+    variant(("servings",), 0),
+])
+def test_invalid_recipes_are_rejected(text):
+    with pytest.raises(ValueError):
+        parse_structured_recipe(text)
+
+def test_wire_schema_drops_local_bounds():
+    schema = json.dumps(recipe_writeback.response_format())
+    assert '"strict": true' in schema
+    assert not any(f'"{keyword}"' in schema for keyword in recipe_writeback.LOCAL_ONLY_KEYWORDS)
+
+def test_queued_recipes_are_written_once(db, monkeypatch):
+    # Keep the background writer out of the way; the test flushes explicitly
+    monkeypatch.setattr(recipe_writeback, '_run_writer', lambda: None)
+    recipe = parse_structured_recipe(json.dumps(VALID))
+    queue_writeback(recipe, 'generation-1')
+    queue_writeback(recipe, 'generation-1')
+    assert flush_writebacks() == 1
+    written = [r for r in db.get_recipe_catalog() if r.title_en == "Gator Gumbo"]
+    assert len(written) == 1
+    assert [ing.name for ing in written[0].ingredients] == ["gator", "okra"]
@@ -0,0 +1,64 @@
+import pytest
+
+import response_cache
+from response_cache import ResponseCache, make_cache_key
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache, 'time', clock)
+    return clock
+
+def test_hits_rotate_through_variants(db, clock):
+    cache = ResponseCache(variants=3, fill_probability=1.0)
+    key = make_cache_key(['okra'], 'english', 'grok', 0.7)
+    for variant in ('a', 'b', 'c'):
+        assert cache.get(key) is None
+        cache.put(key, variant)
+        clock.now += 1
+    assert [cache.get(key) for _ in range(6)] == ['c', 'b', 'a', 'c', 'b', 'a']
+
+def test_partial_key_is_served_unless_filling(db, clock):
+    cache = ResponseCache(variants=3, fill_probability=0.0)
+    cache.put('key', 'first')
+    assert cache.get('key') == 'first'
+    cache.fill_probability = 1.0
+    assert cache.get('key') is None
+
+def test_disk_tier_survives_a_cold_memory_tier(db, clock):
+    ResponseCache(variants=2, fill_probability=1.0).put('key', 'one')
+    clock.now += 1
+    ResponseCache(variants=2, fill_probability=1.0).put('key', 'two')
+    cold = ResponseCache(variants=2, fill_probability=1.0)
+    assert {cold.get('key'), cold.get('key')} == {'one', 'two'}
+    assert cold.stats()['disk_hits'] == 1
+    assert cold.stats()['memory_hits'] == 1
+
+def test_entries_expire_after_ttl(db, clock):
+    cache = ResponseCache(ttl=60, variants=1)
+    cache.put('key', 'stale soon')
+    clock.now += 59
+    assert cache.get('key') == 'stale soon'
+    clock.now += 2
+    assert cache.get('key') is None
+    assert ResponseCache(ttl=60, variants=1).get('key') is None
+
+def test_memory_tier_evicts_least_recently_used(db, clock):
+    cache = ResponseCache(max_entries=2, variants=1)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    cache.get('a')
+    cache.put('c', 'C')
+    assert cache.stats()['memory_entries'] == 2
+    assert list(cache._entries) == ['a', 'c']
+
+def test_cache_key_normalizes_ingredients():
+    assert make_cache_key([' Okra', 'grits'], 'english', 'grok', 0.71) == make_cache_key(['grits', 'okra'], 'english', 'grok', 0.7)
+    assert make_cache_key(['okra'], 'english', 'grok', 0.7) != make_cache_key(['okra'], 'spanish', 'grok', 0.7)
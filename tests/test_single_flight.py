@@ -0,0 +1,150 @@
+import asyncio
+import threading
+
+import pytest
+
+import single_flight
+from single_flight import AsyncSingleFlight, CompletedResults, SingleFlight, flight_keys, generate_once
+
+@pytest.fixture
+def completed(db, monkeypatch):
+    completed = CompletedResults()
+    monkeypatch.setattr(single_flight, 'completed_requests', completed)
+    return completed
+
+class WaitCounter(threading.Event):
+    """An Event that counts callers blocked on it, so tests can release a flight once all have joined."""
+
+    def __init__(self):
+        super().__init__()
+        self.waiters = threading.Semaphore(0)
+
+    def wait(self, timeout=None):
+        self.waiters.release()
+        return super().wait(timeout)
+
+def join_flight(monkeypatch):
+    """Make every new flight's done event a WaitCounter; returns the list of those events."""
+    events = []
+
+    class CountingCall(single_flight._Call):
+        def __init__(self):
+            super().__init__()
+            self.done = WaitCounter()
+            events.append(self.done)
+
+    monkeypatch.setattr(single_flight, '_Call', CountingCall)
+    return events
+
+def test_concurrent_callers_share_one_execution(monkeypatch):
+    flights = SingleFlight()
+    events = join_flight(monkeypatch)
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fn():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {'text': 'Gumbo'}
+
+    def caller(keys):
+        results.append(flights.do(keys, fn))
+
+    leader = threading.Thread(target=caller, args=(['request:a', 'ingredients:okra'],))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=caller, args=(keys,)) for keys in (['request:a'], ['request:b', 'ingredients:okra'])]
+    for thread in followers:
+        thread.start()
+    for _ in followers:
+        assert events[0].waiters.acquire(timeout=5)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert all(result == {'text': 'Gumbo'} for result, _ in results)
+    assert flights._calls == {}
+
+def test_errors_propagate_to_followers_and_clear_the_flight(monkeypatch):
+    flights = SingleFlight()
+    events = join_flight(monkeypatch)
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def fn():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('xAI down')
+
+    def caller():
+        try:
+            flights.do(['request:a'], fn)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=caller)]
+    threads[0].start()
+    started.wait(5)
+    threads.append(threading.Thread(target=caller))
+    threads[1].start()
+    assert events[0].waiters.acquire(timeout=5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(errors) == 2
+    assert flights.do(['request:a'], lambda: 'retried') == ('retried', False)
+
+def test_async_callers_share_one_execution():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {'text': 'Gumbo'}
+
+    async def main():
+        return await asyncio.gather(
+            flights.do(['request:a', 'ingredients:okra'], fn),
+            flights.do(['request:a'], fn),
+            flights.do(['ingredients:okra'], fn))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
+
+def test_flight_keys_separate_languages_and_random_requests():
+    english = flight_keys('a', ['Okra', 'grits'], False)
+    assert english[0] == 'request:a'
+    assert english[1] == flight_keys(None, ['grits', 'okra '], False, {'language': 'english'})[0]
+    assert english[1] != flight_keys('a', ['okra', 'grits'], False, {'language': 'spanish'})[1]
+    assert flight_keys('a', [], True) == ['request:a']
+    assert flight_keys(None, [], True) == []
+
+def test_completed_results_replay_retries(completed):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'text': 'Gumbo', 'title': 'Gumbo'}
+
+    assert generate_once('req-1', ['okra'], False, fn) == {'text': 'Gumbo', 'title': 'Gumbo'}
+    assert generate_once('req-1', ['okra'], False, fn) == {'text': 'Gumbo', 'title': 'Gumbo'}
+    assert len(calls) == 1
+    assert CompletedResults().get('req-1') == {'text': 'Gumbo', 'title': 'Gumbo'}
+
+def test_failed_generations_are_not_replayed(completed):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'text': 'Failed to generate recipe: timeout'}
+
+    generate_once('req-2', ['okra'], False, fn)
+    generate_once('req-2', ['okra'], False, fn)
+    assert len(calls) == 2
+    assert completed.get('req-2') is None
@@ -0,0 +1,399 @@
+import asyncio
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import httpx
+from metrics import xai_request_seconds, xai_tokens
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Connection pool and timeout configuration for calls to api.x.ai
+XAI_HTTP2 = os.getenv("XAI_HTTP2", "true").lower() == "true" and HTTP2_AVAILABLE
+XAI_MAX_CONNECTIONS = int(os.getenv("XAI_MAX_CONNECTIONS", "20"))
+XAI_MAX_KEEPALIVE = int(os.getenv("XAI_MAX_KEEPALIVE", "10"))
+XAI_KEEPALIVE_EXPIRY = float(os.getenv("XAI_KEEPALIVE_EXPIRY", "60"))
+XAI_CONNECT_TIMEOUT = float(os.getenv("XAI_CONNECT_TIMEOUT", "5"))
+XAI_READ_TIMEOUT = float(os.getenv("XAI_READ_TIMEOUT", "30"))
+XAI_WRITE_TIMEOUT = float(os.getenv("XAI_WRITE_TIMEOUT", "10"))
+XAI_POOL_TIMEOUT = float(os.getenv("XAI_POOL_TIMEOUT", "5"))
+
+# Upstream resilience: the circuit breaker opens after XAI_BREAKER_FAILURES consecutive
+# failed or slow calls and probes again after XAI_BREAKER_RESET_SECONDS; retries and
+# hedged duplicates together may add at most XAI_RETRY_BUDGET_RATIO extra calls
+XAI_BREAKER_FAILURES = int(os.getenv("XAI_BREAKER_FAILURES", "5"))
+XAI_BREAKER_RESET_SECONDS = float(os.getenv("XAI_BREAKER_RESET_SECONDS", "30"))
+XAI_SLOW_CALL_SECONDS = float(os.getenv("XAI_SLOW_CALL_SECONDS", "20"))
+XAI_MAX_RETRIES = int(os.getenv("XAI_MAX_RETRIES", "2"))
+XAI_RETRY_BUDGET_RATIO = float(os.getenv("XAI_RETRY_BUDGET_RATIO", "0.1"))
+XAI_RETRY_BACKOFF_BASE = float(os.getenv("XAI_RETRY_BACKOFF_BASE", "0.25"))
+XAI_RETRY_BACKOFF_MAX = float(os.getenv("XAI_RETRY_BACKOFF_MAX", "4"))
+XAI_RETRY_DEADLINE = float(os.getenv("XAI_RETRY_DEADLINE", "20"))
+XAI_HEDGE_ENABLED = os.getenv("XAI_HEDGE_ENABLED", "false").lower() == "true"
+XAI_HEDGE_MIN_DELAY = float(os.getenv("XAI_HEDGE_MIN_DELAY", "1"))
+XAI_HEDGE_QUANTILE = 0.95
+XAI_HEDGE_MIN_SAMPLES = 20
+
+_client_lock = threading.Lock()
+_client = None
+_client_pid = None
+_async_client = None
+_async_client_loop = None
+_hedge_pool = None
+_hedge_pool_pid = None
+
+def _client_options():
+    """Return the pool and timeout settings shared by the sync and async clients."""
+    return dict(
+        http2=XAI_HTTP2,
+        limits=httpx.Limits(
+            max_connections=XAI_MAX_CONNECTIONS,
+            max_keepalive_connections=XAI_MAX_KEEPALIVE,
+            keepalive_expiry=XAI_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(
+            connect=XAI_CONNECT_TIMEOUT,
+            read=XAI_READ_TIMEOUT,
+            write=XAI_WRITE_TIMEOUT,
+            pool=XAI_POOL_TIMEOUT
+        )
+    )
+
+def _build_client():
+    """Create the pooled keep-alive client used for every xAI request."""
+    return httpx.Client(**_client_options())
+
+def get_http_client():
+    """Return this process's shared xAI client, creating it on first use.
+
+    The client is tied to the pid that created it, so a worker forked from a
+    gunicorn --preload master never reuses sockets inherited from the parent.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = _build_client()
+            _client_pid = pid
+            logging.debug(f"Created pooled xAI HTTP client for pid {pid} (http2={XAI_HTTP2})")
+        return _client
+
+def close_http_client():
+    """Close the shared client if this process created it."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            try:
+                _client.close()
+                logging.debug(f"Closed pooled xAI HTTP client for pid {_client_pid}")
+            except Exception as e:
+                logging.error(f"Error closing xAI HTTP client: {str(e)}")
+        _client = None
+        _client_pid = None
+
+def get_async_http_client():
+    """Return the pooled AsyncClient bound to the running event loop."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(**_client_options())
+        _async_client_loop = loop
+        logging.debug(f"Created pooled async xAI HTTP client for pid {os.getpid()} (http2={XAI_HTTP2})")
+    return _async_client
+
+async def close_async_http_client():
+    """Close the AsyncClient if it belongs to the running event loop."""
+    global _async_client, _async_client_loop
+    if _async_client is not None and _async_client_loop is asyncio.get_running_loop():
+        try:
+            await _async_client.aclose()
+            logging.debug("Closed pooled async xAI HTTP client")
+        except Exception as e:
+            logging.error(f"Error closing async xAI HTTP client: {str(e)}")
+    _async_client = None
+    _async_client_loop = None
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling xAI while the circuit breaker is open."""
+
+def is_retryable(error):
+    """Check whether a failed xAI call is worth retrying (timeouts, connection errors, 429 and 5xx)."""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe.
+
+    Closed: calls flow. Open: calls are refused until reset_timeout has passed.
+    Half-open: one probe call is let through; its outcome closes or reopens the breaker.
+    """
+
+    def __init__(self, failure_threshold=XAI_BREAKER_FAILURES, reset_timeout=XAI_BREAKER_RESET_SECONDS,
+                 slow_call_seconds=XAI_SLOW_CALL_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.slow_call_seconds = slow_call_seconds
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.counters = {'opened': 0, 'rejected': 0}
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a call may go upstream now."""
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            # Open, or half-open with a probe that never reported back
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+                self.opened_at = time.monotonic()
+                return True
+            self.counters['rejected'] += 1
+            return False
+
+    def record(self, success):
+        with self._lock:
+            if success:
+                self.state = 'closed'
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                if self.state != 'open':
+                    self.counters['opened'] += 1
+                    logging.warning(f"xAI circuit breaker opened after {self.failures} consecutive failures")
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def record_call(self, elapsed, error=None):
+        """Record a finished call: slow calls and retryable errors count as failures."""
+        xai_request_seconds.observe(elapsed, outcome='success' if error is None else 'error')
+        self.record(elapsed < self.slow_call_seconds if error is None else not is_retryable(error))
+
+class RetryBudget:
+    """Token bucket limiting retries and hedges to a fraction of first attempts."""
+
+    def __init__(self, ratio=XAI_RETRY_BUDGET_RATIO, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend one token; returns False when the budget is exhausted."""
+        with self._lock:
+            if self.tokens < 1.0:
+                return False
+            self.tokens -= 1.0
+            return True
+
+class LatencyTracker:
+    """Recent successful xAI call latencies, for choosing the hedge delay."""
+
+    def __init__(self, size=200):
+        self._samples = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._samples.append(seconds)
+
+    def quantile(self, q, min_samples=XAI_HEDGE_MIN_SAMPLES):
+        """Return the q-quantile of recent latencies, or None with too few samples."""
+        samples = sorted(self._samples)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+circuit_breaker = CircuitBreaker()
+retry_budget = RetryBudget()
+upstream_latency = LatencyTracker()
+
+def _hedge_delay():
+    if not XAI_HEDGE_ENABLED:
+        return None
+    p95 = upstream_latency.quantile(XAI_HEDGE_QUANTILE)
+    return None if p95 is None else max(p95, XAI_HEDGE_MIN_DELAY)
+
+def _backoff(attempt):
+    """Full-jitter exponential backoff before retry number `attempt` (from 0)."""
+    return random.uniform(0, min(XAI_RETRY_BACKOFF_MAX, XAI_RETRY_BACKOFF_BASE * 2 ** attempt))
+
+def _get_hedge_pool():
+    global _hedge_pool, _hedge_pool_pid
+    pid = os.getpid()
+    with _client_lock:
+        if _hedge_pool is None or _hedge_pool_pid != pid:
+            _hedge_pool = ThreadPoolExecutor(max_workers=XAI_MAX_CONNECTIONS, thread_name_prefix='xai-hedge')
+            _hedge_pool_pid = pid
+        return _hedge_pool
+
+def _post_once(url, headers, payload):
+    start = time.monotonic()
+    response = get_http_client().post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json(), time.monotonic() - start
+
+def _attempt(url, headers, payload):
+    """Make one call, racing a duplicate against it once it outlives the recent p95."""
+    delay = _hedge_delay()
+    if delay is None:
+        return _post_once(url, headers, payload)
+    pool = _get_hedge_pool()
+    primary = pool.submit(_post_once, url, headers, payload)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeoutError:
+        pass
+    if not retry_budget.withdraw():
+        return primary.result()
+    logging.info(f"Hedging xAI request still pending after {delay:.2f}s")
+    error = None
+    for future in as_completed([primary, pool.submit(_post_once, url, headers, payload)]):
+        try:
+            return future.result()
+        except Exception as e:
+            error = e
+    raise error
+
+def _record_usage(body):
+    """Record the prompt and completion token counts reported by xAI."""
+    usage = body.get('usage') if isinstance(body, dict) else None
+    if not isinstance(usage, dict):
+        return
+    for kind in ('prompt', 'completion'):
+        tokens = usage.get(f"{kind}_tokens")
+        if isinstance(tokens, int):
+            xai_tokens.observe(tokens, type=kind)
+
+def _should_retry(error, attempt, started):
+    return (is_retryable(error) and attempt < XAI_MAX_RETRIES
+            and time.monotonic() - started < XAI_RETRY_DEADLINE and retry_budget.withdraw())
+
+def post_completion(url, headers, payload):
+    """POST a chat completion through the circuit breaker with budgeted, jittered retries.
+
+    Returns the decoded JSON body. Raises UpstreamUnavailable while the breaker is
+    open (including when this call's own failures open it), otherwise the last error.
+    """
+    if not circuit_breaker.allow():
+        raise UpstreamUnavailable("xAI circuit breaker is open")
+    retry_budget.deposit()
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt_started = time.monotonic()
+        try:
+            body, elapsed = _attempt(url, headers, payload)
+        except Exception as e:
+            circuit_breaker.record_call(time.monotonic() - attempt_started, e)
+            if circuit_breaker.state == 'open':
+                raise UpstreamUnavailable("xAI circuit breaker opened") from e
+            if not _should_retry(e, attempt, started):
+                raise
+            delay = _backoff(attempt)
+            attempt += 1
+            logging.warning(f"Retrying xAI request (attempt {attempt + 1}) in {delay:.2f}s after: {str(e)}")
+            time.sleep(delay)
+            continue
+        upstream_latency.add(elapsed)
+        circuit_breaker.record_call(elapsed)
+        _record_usage(body)
+        return body
+
+async def _post_once_async(url, headers, payload):
+    start = time.monotonic()
+    response = await get_async_http_client().post(url, headers=headers, json=payload)
+    response.raise_for_status()
+    return response.json(), time.monotonic() - start
+
+async def _attempt_async(url, headers, payload):
+    """Async _attempt; the losing request of a hedged pair is cancelled."""
+    delay = _hedge_delay()
+    if delay is None:
+        return await _post_once_async(url, headers, payload)
+    tasks = {asyncio.ensure_future(_post_once_async(url, headers, payload))}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if done or not retry_budget.withdraw():
+            return await next(iter(tasks))
+        logging.info(f"Hedging async xAI request still pending after {delay:.2f}s")
+        tasks.add(asyncio.ensure_future(_post_once_async(url, headers, payload)))
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def post_completion_async(url, headers, payload):
+    """Async post_completion."""
+    if not circuit_breaker.allow():
+        raise UpstreamUnavailable("xAI circuit breaker is open")
+    retry_budget.deposit()
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        attempt_started = time.monotonic()
+        try:
+            body, elapsed = await _attempt_async(url, headers, payload)
+        except Exception as e:
+            circuit_breaker.record_call(time.monotonic() - attempt_started, e)
+            if circuit_breaker.state == 'open':
+                raise UpstreamUnavailable("xAI circuit breaker opened") from e
+            if not _should_retry(e, attempt, started):
+                raise
+            delay = _backoff(attempt)
+            attempt += 1
+            logging.warning(f"Retrying async xAI request (attempt {attempt + 1}) in {delay:.2f}s after: {str(e)}")
+            await asyncio.sleep(delay)
+            continue
+        upstream_latency.add(elapsed)
+        circuit_breaker.record_call(elapsed)
+        _record_usage(body)
+        return body
+
+def upstream_stats():
+    """Return circuit breaker state, retry budget and recent latency for /api/stats."""
+    return {
+        'breaker_state': circuit_breaker.state,
+        'consecutive_failures': circuit_breaker.failures,
+        **circuit_breaker.counters,
+        'retry_tokens': round(retry_budget.tokens, 2),
+        'p95_seconds': upstream_latency.quantile(XAI_HEDGE_QUANTILE, min_samples=1),
+        'hedging': XAI_HEDGE_ENABLED
+    }
+
+def _reset_after_fork():
+    """Drop the inherited client in a forked child without closing the parent's sockets."""
+    global _client, _client_lock, _client_pid, _async_client, _async_client_loop, _hedge_pool, _hedge_pool_pid
+    _client_lock = threading.Lock()
+    _hedge_pool = None
+    _hedge_pool_pid = None
+    _client = None
+    _client_pid = None
+    _async_client = None
+    _async_client_loop = None
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(close_http_client)